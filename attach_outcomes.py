@@ -1,5 +1,8 @@
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
 import sportsbettingscrapers as sbs
 import fuzzymatching as fm
 import os
@@ -37,15 +40,30 @@ for period in [last_period,current_period]:
         if len(prob_filenames) == 0:
             continue
 
-        prob_filepaths = [os.path.join(prob_dir,x) for x in prob_filenames]
-        prob_df = pd.concat([pd.read_parquet(x) for x in prob_filepaths]).reset_index(drop=True)
-
         # Read in data on game scores scraped from league websites for current month
         score_filepath = os.path.join(score_dir,f'{period_str}_{league}_scores.parquet')
         score_df = pd.read_parquet(score_filepath).drop(columns=['home_abbr','away_abbr'])
 
+        prob_filepaths = [os.path.join(prob_dir,x) for x in prob_filenames]
+
+        # Read all files as a single Arrow dataset, only decoding the columns we need
+        prob_cols = ['observation_datetime',
+                     'game_datetime',
+                     'game_date',
+                     'home_team',
+                     'away_team',
+                     'sportsbook_name',
+                     'sportsbook_id',
+                     'moneyline_home_odds',
+                     'moneyline_away_odds',
+                     'moneyline_home_prob',
+                     'moneyline_away_prob']
+
         # Only keep lines for games that have been completed
-        prob_df = prob_df[prob_df['game_date'] <= score_df['game_date'].max()]
+        # (filter is applied while scanning so rows for later games are never materialized)
+        completed_filter = (ds.field('game_date') <= score_df['game_date'].max())
+
+        prob_df = ds.dataset(prob_filepaths,format='parquet').to_table(columns=prob_cols,filter=completed_filter).to_pandas(self_destruct=True)
 
         ## Harmonize team names
 
@@ -86,9 +104,10 @@ for period in [last_period,current_period]:
         prob_df = prob_df[m].reset_index(drop=True)
 
         # Convert game score into bet outcome (1 if bet hits, 0 otherwise)
-        prob_df['moneyline_home_outcome'] = (prob_df['home_score'] > prob_df['away_score']).astype(int)
-        prob_df['moneyline_away_outcome'] = 1 - prob_df['moneyline_home_outcome']
+        home_win = np.greater(prob_df['home_score'].to_numpy(),prob_df['away_score'].to_numpy()).view(np.uint8)
+        prob_df['moneyline_home_outcome'] = home_win
+        prob_df['moneyline_away_outcome'] = home_win ^ 1
 
         # Save to file
         outname = os.path.join(outcome_dir,f'{period_str}_{league}_outcomes.parquet')
-        prob_df.to_parquet(outname)
+        pq.write_table(pa.Table.from_pandas(prob_df,preserve_index=False),outname,compression='zstd',use_dictionary=True,row_group_size=50000)
@@ -1,10 +1,44 @@
 import numpy as np
 import pandas as pd
-import scipy.interpolate as interp
+import pyarrow as pa
+import pyarrow.parquet as pq
 import sportsbettingscrapers as sbs
 import json
 import os
 
+### *** HELPER FUNCTIONS *** ###
+
+def interp_rows(x,xp,fp):
+    """
+    Linear interpolation of a single value against each row of a 2D array of sample points. Values of x that
+    fall outside the range of a row are set to the first or last value of fp.
+
+    param: x: value at which to evaluate interpolant (scalar)
+    param: xp: increasing x-coordinates of data points (n x s array)
+    param: fp: y-coordinates of data points shared by each row of xp (vector of length s)
+
+    returns: y: interpolated value for each row of xp (vector of length n)
+    """
+
+    n,s = xp.shape
+    rows = np.arange(n)
+
+    # Index of right-hand data point bracketing x in each row
+    j = np.clip(np.sum(xp < x,axis=1),1,s-1)
+
+    x0 = xp[rows,j-1]
+    x1 = xp[rows,j]
+    y0 = fp[j-1]
+    y1 = fp[j]
+
+    with np.errstate(divide='ignore',invalid='ignore'):
+        y = np.where(x1 > x0,y0 + (x-x0)*(y1-y0)/(x1-x0),y1)
+
+    y = np.where(x < xp[:,0],fp[0],y)
+    y = np.where(x > xp[:,-1],fp[-1],y)
+
+    return(y)
+
 ### *** BAYESIAN MODEL COMBINATION CLASS *** ###
 
 class ModelCombination:
@@ -19,18 +53,45 @@ class ModelCombination:
 
         # Specify function to interpolate between timepoints
         y = np.arange(self.num_timepoints)
-        linear_interp = interp.interp1d(self.timepoints,y,kind='linear',bounds_error=False,fill_value='extrapolate')
-        self.interp_func = lambda x: np.maximum(np.minimum(linear_interp(x),y.max()),y.min())
+        # (values of t outside the range of timepoints are clamped to the first/last timepoint)
+        self.interp_func = lambda x: np.interp(x,self.timepoints,y)
 
         self.models = weight_df.columns.to_list()
         self.num_models = len(self.models)
 
+        # Lookup table of column index associated with each model
+        self.model_index = {model_name:i for i,model_name in enumerate(self.models)}
+
         # Posterior distribution of model combination weights for each timepoint
         self.posterior_dist = []
 
         for t in self.timepoints:
             self.posterior_dist.append(weight_df.loc[t].to_numpy())
 
+        # Cache of posterior weights renormalized over the subset of models with available forecasts
+        # (keyed by timepoint index and availability vector)
+        self.normalized_dist_cache = {}
+
+    def get_normalized_weights(self,it,v):
+        """
+        Return the posterior distribution of model weights at a discrete timepoint after renormalizing
+        over the models that have forecasts available. Results are cached since the same set of available
+        models tends to recur across many games.
+
+        param: it: index of discrete timepoint
+        param: v: Boolean array denoting which models had forecasts available
+
+        returns: w_norm_dist: renormalized posterior distribution of weights (n_samples x n_models array)
+        """
+
+        key = (it,v.tobytes())
+
+        if key not in self.normalized_dist_cache:
+            w_dist = self.posterior_dist[it]*v
+            self.normalized_dist_cache[key] = w_dist/np.sum(w_dist,axis=1,keepdims=True)
+
+        return self.normalized_dist_cache[key]
+
     def get_timepoint_weights(self,t):
         """
         This function uses linear interpolation to determine how much "time weight" to give to model weights
@@ -79,29 +140,27 @@ class ModelCombination:
 
         for model_name,forecast_value in f_dict.items():
 
-            if model_name in self.models:
+            model_index = self.model_index.get(model_name)
 
-                model_index = self.models.index(model_name)
+            if model_index is not None:
                 f[model_index] = forecast_value
                 v[model_index] = 1
 
         # Get weight associated with each timepoint
         it1,it2,wt1,wt2 = self.get_timepoint_weights(t)
 
-        w1_dist = self.posterior_dist[it1]
-        w2_dist = self.posterior_dist[it2]
-
-        num_t1_samples = w1_dist.shape[0]
-        num_t2_samples = w2_dist.shape[0]
-
-        t1_sample_weights = wt1*np.ones(num_t1_samples)/num_t1_samples
-        t2_sample_weights = wt2*np.ones(num_t2_samples)/num_t2_samples
+        # Combination forecast implied by each posterior sample of weights at left timepoint
+        f_bar_dist = self.get_normalized_weights(it1,v) @ f
+        sample_weights = np.full(len(f_bar_dist),wt1/len(f_bar_dist))
 
-        f_bar_t1_dist = np.sum(w1_dist*v*f,axis=1)/np.sum(w1_dist*v,axis=1)
-        f_bar_t2_dist = np.sum(w2_dist*v*f,axis=1)/np.sum(w2_dist*v,axis=1)
+        # Only pool samples from right timepoint if it receives nonzero weight
+        # (avoids doubling the number of samples to sort when t falls on or outside the discrete timepoints)
+        if wt2 > 0:
+            f_bar_t2_dist = self.get_normalized_weights(it2,v) @ f
+            t2_sample_weights = np.full(len(f_bar_t2_dist),wt2/len(f_bar_t2_dist))
 
-        f_bar_dist = np.concatenate((f_bar_t1_dist,f_bar_t2_dist))
-        sample_weights = np.concatenate((t1_sample_weights,t2_sample_weights))
+            f_bar_dist = np.concatenate((f_bar_dist,f_bar_t2_dist))
+            sample_weights = np.concatenate((sample_weights,t2_sample_weights))
 
         # Sort from smallest to largest (helpful for calculating CIs)
         sort_inds = np.argsort(f_bar_dist)
@@ -109,17 +168,15 @@ class ModelCombination:
         sample_weights = sample_weights[sort_inds]
 
         # For weighted CDF, Pr(X <= x) = sum(weights[X <= x])
-        CDF_vals = np.cumsum(sample_weights)/np.sum(sample_weights)
-        PPF_func = interp.interp1d(CDF_vals,f_bar_dist,kind='linear',bounds_error=False,fill_value=(f_bar_dist[0],f_bar_dist[-1]))
+        CDF_vals = np.cumsum(sample_weights)
+        CDF_vals /= CDF_vals[-1]
 
         # Get expected value of combination forecast
-        f_bar = np.average(f_bar_dist,weights=sample_weights)
+        f_bar = np.dot(f_bar_dist,sample_weights)/np.sum(sample_weights)
 
-        # Get 100*(1-alpha) % credible interval
-        LB = float(PPF_func(alpha/2))
-        UB = float(PPF_func(1-alpha/2))
-
-        bounds = np.array([LB,UB])
+        # Get 100*(1-alpha) % credible interval by inverting the weighted CDF
+        # (quantiles beyond the range of the samples are set to the smallest/largest sample)
+        bounds = np.interp([alpha/2,1-alpha/2],CDF_vals,f_bar_dist)
 
         return f_bar,bounds
 
@@ -135,25 +192,65 @@ class ModelCombination:
         returns: w_UB_df: upper bound of 100*(1-alpha)% credible interval of weights
         """
 
+        t_vals = np.asarray(t_vals)
+
         w_bar_df = pd.DataFrame({'t':t_vals}).set_index('t')
         w_LB_df = w_bar_df.copy()
         w_UB_df = w_bar_df.copy()
 
-        for model in self.models:
+        # Get weight associated with each timepoint for all values of t at once
+        it = self.interp_func(t_vals)
+        it1 = np.floor(it).astype(int)
+        it2 = np.ceil(it).astype(int)
+
+        t1 = self.timepoints[it1]
+        t2 = self.timepoints[it2]
+
+        wt2 = np.zeros(t_vals.shape)
+        m = (it1 != it2)
+        wt2[m] = (t_vals[m]-t1[m])/(t2[m]-t1[m])
+        wt1 = 1-wt2
 
-            f_dict = {x:0 for x in self.models}
-            f_dict[model] = 1
+        # Since every model contributes a forecast, the combination forecast of an indicator
+        # vector for a given model is that model's share of the total weight
+        normalized_dist = [w_dist/np.sum(w_dist,axis=1,keepdims=True) for w_dist in self.posterior_dist]
+
+        for model_index,model in enumerate(self.models):
 
             w_bar_vals = np.zeros(t_vals.shape)
             w_LB_vals = np.zeros(t_vals.shape)
             w_UB_vals = np.zeros(t_vals.shape)
 
-            for i,t in enumerate(t_vals):
+            # Values of t that lie between the same pair of discrete timepoints share a set of samples,
+            # so we only need to sort them once and can then compute the weighted CDF for all such t together
+            # (as in combine_forecasts, samples from the right timepoint are only pooled if it receives nonzero weight)
+            it2_pooled = np.where(wt2 > 0,it2,-1)
+
+            for pair in np.unique(np.stack((it1,it2_pooled),axis=1),axis=0):
+
+                m = (it1 == pair[0])&(it2_pooled == pair[1])
+
+                w1_dist = normalized_dist[pair[0]][:,model_index]
+                w2_dist = normalized_dist[pair[1]][:,model_index] if pair[1] >= 0 else np.zeros(0)
+
+                w_dist = np.concatenate((w1_dist,w2_dist))
+                from_t1 = np.concatenate((np.ones(len(w1_dist)),np.zeros(len(w2_dist))))
 
-                w_bar,(w_LB,w_UB) = self.combine_forecasts(f_dict,t,alpha=alpha)
-                w_bar_vals[i] = w_bar
-                w_LB_vals[i] = w_LB
-                w_UB_vals[i] = w_UB
+                # Sort from smallest to largest (helpful for calculating CIs)
+                sort_inds = np.argsort(w_dist)
+                w_dist = w_dist[sort_inds]
+                from_t1 = from_t1[sort_inds]
+
+                # Weighted CDF of each value of t (rows) evaluated at each sample (columns)
+                CDF_vals = np.outer(wt1[m],np.cumsum(from_t1)/len(w1_dist))
+                w_bar_vals[m] = wt1[m]*np.mean(w1_dist)
+
+                if len(w2_dist) > 0:
+                    CDF_vals += np.outer(wt2[m],np.cumsum(1-from_t1)/len(w2_dist))
+                    w_bar_vals[m] += wt2[m]*np.mean(w2_dist)
+
+                w_LB_vals[m] = interp_rows(alpha/2,CDF_vals,w_dist)
+                w_UB_vals[m] = interp_rows(1-alpha/2,CDF_vals,w_dist)
 
             w_bar_df[model] = w_bar_vals
             w_LB_df[model] = w_LB_vals
@@ -189,12 +286,19 @@ for league in leagues:
     prob_df['t'] = (prob_df['observation_datetime'] - prob_df['game_datetime']).dt.total_seconds()/3600
 
     # Create unique id for each game
-    prob_df['matchup'] = prob_df['away_team'] + ' @ ' + prob_df['home_team']
-    prob_df['game_id'] = prob_df['game_date'].astype(str) + ' ' + prob_df['matchup']
-    game_ids = prob_df['game_id'].unique()
+    # (integer codes are used as the key for deduplication and grouping, while the string id
+    # and matchup are only built once per unique game and attached to the saved output)
+    game_index,games = pd.factorize(pd.MultiIndex.from_arrays([prob_df['game_date'],prob_df['away_team'],prob_df['home_team']]))
+    prob_df['game_index'] = game_index
+    game_matchups = (games.get_level_values(1) + ' @ ' + games.get_level_values(2)).to_numpy()
+    game_ids = (games.get_level_values(0).astype(str) + ' ' + game_matchups).to_numpy()
 
     # Drop duplicate lines (often indicates an issue with parsing team names)
-    prob_df.drop_duplicates(subset=['game_id','sportsbook_name','observation_datetime'],keep=False,inplace=True)
+    # (factorize each key column to integer codes and count occurrences of each combined key with bincount)
+    codes = [pd.factorize(prob_df[col])[0] for col in ['game_index','sportsbook_name','observation_datetime']]
+    key = np.ravel_multi_index(codes,[np.max(c,initial=0)+1 for c in codes])
+    key_counts = np.bincount(key)
+    prob_df = prob_df[key_counts[key] == 1].reset_index(drop=True)
 
     # Read in model combination weights
     weights_dir = os.path.join(pwd,f'data/weights/{league}')
@@ -204,42 +308,52 @@ for league in leagues:
     # Initialize model combination class that we'll use to calculate weighted forecasts
     mc = ModelCombination(weights_df)
 
-    roi_df_list = []
+    # Columns of ROI dataframe, accumulated across games and converted to a dataframe once at the end
+    # (each game contributes its home lines followed by its away lines)
+    row_index_list = []
+    sportsbook_col = []
+    side_col = []
+    odds_col = []
+    hit_prob_col = []
+    eroi_col = []
 
-    for game_id in game_ids:
+    for game_index,game_df in prob_df.groupby('game_index',sort=False):
 
         ## Calculate expected ROI for each betting line and save to dataframe
 
         # Get odds-implied probability from each sportsbook
-        m = (prob_df['game_id']==game_id)
-        f_dict = prob_df[m][['sportsbook_name','moneyline_home_prob']].set_index('sportsbook_name').to_dict()['moneyline_home_prob']
-        t = prob_df[m]['t'].iloc[0]
+        f_dict = game_df[['sportsbook_name','moneyline_home_prob']].set_index('sportsbook_name').to_dict()['moneyline_home_prob']
+        t = game_df['t'].iloc[0]
 
         # Caclulated weighted-average probability of home win
         f_bar,bounds = mc.combine_forecasts(f_dict,t)
 
         # Calculate probability of each side of the bet hitting
-        home_df = prob_df[m][['observation_datetime','game_datetime','game_id','matchup','sportsbook_name','home_team','moneyline_home_odds']]
-        home_df = home_df.rename(columns={'sportsbook_name':'sportsbook','home_team':'side','moneyline_home_odds':'odds'})
-        away_df = prob_df[m][['observation_datetime','game_datetime','game_id','matchup','sportsbook_name','away_team','moneyline_away_odds']]
-        away_df = away_df.rename(columns={'sportsbook_name':'sportsbook','away_team':'side','moneyline_away_odds':'odds'})
-        home_df['hit_prob'] = f_bar
-        away_df['hit_prob'] = 1 - f_bar
+        n_lines = len(game_df)
+        sportsbook = game_df['sportsbook_name'].tolist()*2
+        side = game_df['home_team'].tolist() + game_df['away_team'].tolist()
+        odds = game_df['moneyline_home_odds'].tolist() + game_df['moneyline_away_odds'].tolist()
+        hit_prob = [f_bar]*n_lines + [1 - f_bar]*n_lines
 
         # Calculate expected return on investment (ROI)
-        game_roi_df = pd.concat([home_df,away_df])
-        game_roi_df['EROI'] = game_roi_df['hit_prob']*game_roi_df['odds'] - 1
-        roi_df_list.append(game_roi_df)
+        eroi = (np.array(hit_prob)*np.array(odds) - 1).tolist()
+
+        row_index_list += [game_df.index.to_numpy()]*2
+        sportsbook_col.extend(sportsbook)
+        side_col.extend(side)
+        odds_col.extend(odds)
+        hit_prob_col.extend(hit_prob)
+        eroi_col.extend(eroi)
 
         # Also save info as JSON file that can be passed to dashboard app
         game_dict = {'game_id':''}
-        game_datetime_utc = home_df['game_datetime'].dt.tz_convert('UTC').iloc[0]
-        observation_datetime_utc = home_df['observation_datetime'].dt.tz_convert('UTC').iloc[0]
+        game_datetime_utc = game_df['game_datetime'].dt.tz_convert('UTC').iloc[0]
+        observation_datetime_utc = game_df['observation_datetime'].dt.tz_convert('UTC').iloc[0]
         game_dict['game_datetime'] = game_datetime_utc.isoformat()
         game_dict['observation_datetime'] = observation_datetime_utc.isoformat()
         game_dict['league'] = league
-        game_dict['home_team'] = home_df['side'].iloc[0]
-        game_dict['away_team'] = away_df['side'].iloc[0]
+        game_dict['home_team'] = game_df['home_team'].iloc[0]
+        game_dict['away_team'] = game_df['away_team'].iloc[0]
         game_dict['home_win_prob'] = f_bar
         game_dict['away_win_prob'] = 1 - f_bar
 
@@ -247,18 +361,26 @@ for league in leagues:
         game_dict['game_id'] = f'{league} ' + game_datetime_utc.strftime('%Y-%m-%d ') + game_dict['away_team'] + ' @ ' + game_dict['home_team']
 
         # Add available betting lines for game
-        game_dict['lines'] = game_roi_df[['sportsbook','side','odds','hit_prob','EROI']].to_dict(orient='records')
+        game_dict['lines'] = [{'sportsbook':x[0],'side':x[1],'odds':x[2],'hit_prob':x[3],'EROI':x[4]} for x in zip(sportsbook,side,odds,hit_prob,eroi)]
         roi_json_data.append(game_dict)
 
     # Save as dataframe
-    roi_df = pd.concat(roi_df_list)
+    row_index = np.concatenate(row_index_list) if row_index_list else np.array([],dtype=int)
+    roi_df = prob_df.loc[row_index,['observation_datetime','game_datetime']].reset_index(drop=True)
+    roi_df['game_id'] = game_ids[prob_df['game_index'].to_numpy()[row_index]]
+    roi_df['matchup'] = game_matchups[prob_df['game_index'].to_numpy()[row_index]]
+    roi_df['sportsbook'] = sportsbook_col
+    roi_df['side'] = side_col
+    roi_df['odds'] = odds_col
+    roi_df['hit_prob'] = hit_prob_col
+    roi_df['EROI'] = eroi_col
     roi_df = roi_df.sort_values(by=['game_datetime','game_id','sportsbook','side']).reset_index(drop=True)
 
     return_dir = os.path.join(pwd,f'data/returns/{league}/')
     timestamp_str = prob_filepath.split('/')[-1].split('_')[0]
 
     outname = os.path.join(return_dir,f'{timestamp_str}_{league}_returns.parquet')
-    roi_df.to_parquet(outname)
+    pq.write_table(pa.Table.from_pandas(roi_df,preserve_index=False),outname,compression='zstd',use_dictionary=True,row_group_size=50000)
 
 # Save as JSON file
 outname = os.path.join(pwd,'sports-betting-dashboard-roi-data.json')
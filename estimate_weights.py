@@ -1,19 +1,49 @@
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pymc as pm
 import gc
 import os
 
 ### *** FUNCTIONS *** ###
 
-def preprocess_outcome_data(outcome_df,hours_before=(8,12),n_games=1000,sportsbooks=['DraftKings NC','FanDuel NC','Pinnacle']):
+def prepare_outcome_data(outcome_df,cutoff_date=None,sportsbooks=['DraftKings NC','FanDuel NC','Pinnacle']):
+    """
+    This function performs the steps of preprocessing that don't depend on the pre-game time interval
+    being evaluated, so that they only need to be done once before looping over time intervals.
+
+    param: outcome_df: pandas dataframe of pre-game betting lines and post-game outcome data
+    param: cutoff_date: earliest game date to include (e.g., date of the n-th most recent game)
+    param: sportsbooks: list of sportsbooks to evaluate (list of length m)
+
+    returns: outcome_df: dataframe of lines from sportsbooks of interest with added columns denoting
+                         the hours remaining until game start and the index of each sportsbook
+    """
+
+    # Get forecasts for games on or after cutoff date
+    if cutoff_date is not None:
+        outcome_df = outcome_df[outcome_df['game_date'] >= cutoff_date]
+
+    # Get sportsbooks of interest, and create unique index for each book
+    outcome_df = outcome_df[outcome_df['sportsbook_name'].isin(sportsbooks)].copy()
+    outcome_df['sportsbook_index'] = outcome_df['sportsbook_name'].map({book:i for i,book in enumerate(sportsbooks)})
+
+    # Round observation timestamps to nearest 10-minute interval
+    outcome_df['observation_datetime'] = outcome_df['observation_datetime'].dt.floor('10min')
+    outcome_df['hours_remaining'] = (outcome_df['observation_datetime'] - outcome_df['game_datetime']).dt.total_seconds()/3600
+
+    outcome_df = outcome_df.sort_values(by=['game_datetime','home_team','sportsbook_index'])
+
+    return(outcome_df)
+
+def preprocess_outcome_data(outcome_df,hours_before=(8,12),sportsbooks=['DraftKings NC','FanDuel NC','Pinnacle']):
     """
     This function uses a dataframe of pre-game betting lines and post-game outcome data to construct
     numpy arrays encoding information that will be used to parameterize the likelihood function.
 
-    param: outcome_df: pandas dataframe of pre-game betting lines and post-game outcome data
+    param: outcome_df: pandas dataframe of pre-game betting lines and post-game outcome data (output of prepare_outcome_data)
     param: hours_before: number of hours before game start at which to evaluate pre-game betting lines
-    param: n_games: include data from the n most recent games
     param: sportsbooks: list of sportsbooks to evaluate (list of length m)
 
     returns: v: Boolean array denoting whether a betting line was available by game/sportsbook (n x m array)
@@ -22,25 +52,11 @@ def preprocess_outcome_data(outcome_df,hours_before=(8,12),n_games=1000,sportsbo
     returns: included_books: names of sportsbooks corresponding to each column of v and f
     """
 
-    # Get forecasts for N most recent games
-    recent_games = outcome_df[['game_date','home_team','away_team']].drop_duplicates().sort_values(by='game_date').reset_index(drop=True)
-    cutoff_date = recent_games.iloc[-n_games:]['game_date'].min()
-    outcome_df = outcome_df[outcome_df['game_date'] >= cutoff_date]
-
-    # Round observation timestamps to nearest 10-minute interval
-    outcome_df['observation_datetime'] = outcome_df['observation_datetime'].dt.floor('10min')
-
     # Get pre-game betting lines at during specified period
     hours_before = np.sort(hours_before)[::-1]
-    outcome_df['hours_remaining'] = (outcome_df['observation_datetime'] - outcome_df['game_datetime']).dt.total_seconds()/3600
     m = (outcome_df['hours_remaining'] >= -1*hours_before[0])&(outcome_df['hours_remaining'] < -1*hours_before[1])
     outcome_df = outcome_df[m]
 
-    # Get sportsbooks of interest, and create unique index for each book
-    outcome_df = outcome_df[outcome_df['sportsbook_name'].isin(sportsbooks)]
-    outcome_df['sportsbook_index'] = outcome_df['sportsbook_name'].apply(lambda x: sportsbooks.index(x))
-    outcome_df = outcome_df.sort_values(by=['game_datetime','home_team','sportsbook_index'])
-
     # Create unique index for each game forecast. In this context, a "forecast" is defined
     # as a prediction (e.g., implied prob of home team win) made by one or more sportsbooks
     # for a specific game at a specific point in time
@@ -50,19 +66,33 @@ def preprocess_outcome_data(outcome_df,hours_before=(8,12),n_games=1000,sportsbo
 
     # If there are any duplicated forecasts (likely due to incorrect parsing of team names)
     # Drop all duplicates
-    outcome_df.drop_duplicates(subset=['forecast_index','sportsbook_index'],keep=False,inplace=True,ignore_index=True)
+    # (both keys are integers, so count occurrences of each combined key with bincount rather than hashing)
+    key = outcome_df['forecast_index'].to_numpy()*len(sportsbooks) + outcome_df['sportsbook_index'].to_numpy()
+    key_counts = np.bincount(key)
+    outcome_df = outcome_df[key_counts[key] == 1].reset_index(drop=True)
+
+    # Row (forecast) and column (sportsbook) of each betting line in the arrays we're constructing
+    forecast_indices,fi = np.unique(outcome_df['forecast_index'].to_numpy(),return_inverse=True)
+    book_indices,bi = np.unique(outcome_df['sportsbook_index'].to_numpy(),return_inverse=True)
+    included_books = np.array(sportsbooks)[book_indices]
+
+    n = len(forecast_indices)
+    m = len(book_indices)
+
+    probs = outcome_df['moneyline_home_prob'].to_numpy(dtype=float)
+    available = ~np.isnan(probs)
 
     # Sportsbook forecast of home win probability
-    f_dataframe = outcome_df.pivot(index='forecast_index',columns='sportsbook_index',values='moneyline_home_prob')
-    included_books = np.array(sportsbooks)[f_dataframe.columns]
-    f = f_dataframe.to_numpy()
+    f = np.zeros((n,m))
+    f[fi,bi] = np.where(available,probs,0)
 
     # Boolean array denoting which sportsbooks had forecasts available
-    v = 1 - np.isnan(f).astype(int)
-    f = np.nan_to_num(f,nan=0)
+    v = np.zeros((n,m),dtype=int)
+    v[fi,bi] = available
 
     # Observed outcome of game (1=home win, 0=loss)
-    y = outcome_df[['forecast_index','moneyline_home_outcome']].drop_duplicates()['moneyline_home_outcome'].to_numpy()
+    y = np.zeros(n,dtype=int)
+    y[fi] = outcome_df['moneyline_home_outcome'].to_numpy()
 
     # If only one sportsbook is making a forecast, it doesn't provide any information on the
     # relative predictive performance of each book. So drop rows with only one book present.
@@ -73,7 +103,7 @@ def preprocess_outcome_data(outcome_df,hours_before=(8,12),n_games=1000,sportsbo
 
     return(v,f,y,included_books)
 
-def estimate_combination_weights(v,f,y,draws=2500,tune=1000,n_cores=1):
+def estimate_combination_weights(v,f,y,draws=2500,tune=1000,n_cores=1,nuts_sampler='pymc'):
     """
     param: v: Boolean array denoting whether a betting line was available by game/sportsbook (n x m array)
     param: f: Odds-implied probability of a home team win by game/sportsbook (n x m array)
@@ -81,12 +111,17 @@ def estimate_combination_weights(v,f,y,draws=2500,tune=1000,n_cores=1):
     param: draws: number of samples to draw from posterior
     param: tune: number of samples to discard from start of chain during burn-in
     param: n_cores: number of available CPU cores
+    param: nuts_sampler: NUTS implementation used to sample from posterior ('pymc', 'nutpie', 'numpyro', or 'blackjax'; all but 'pymc' must be installed separately)
 
     returns: w_post: posterior distribution of combination weights (n_draws x m array)
     """
 
     n,m = v.shape
 
+    # Terms that don't depend on the weights can be computed once outside of the model graph
+    v = v.astype(float)
+    vf = v*f
+
     bmc_model = pm.Model()
 
     with bmc_model:
@@ -95,13 +130,13 @@ def estimate_combination_weights(v,f,y,draws=2500,tune=1000,n_cores=1):
         w = pm.Dirichlet('weight',a=np.ones(m))
 
         # Combination forecast (i.e., expected probability of home team win)
-        f_bar = pm.math.sum(w*v*f,axis=1)/pm.math.sum(w*v,axis=1)
+        f_bar = pm.math.dot(vf,w)/pm.math.dot(v,w)
 
         # Define likelihood (sampling distribution) of observations
         y_obs = pm.Bernoulli('y_obs',p=f_bar,observed=y)
 
         # Sample from posterior
-        idata = pm.sample(draws=draws,tune=tune,cores=n_cores)
+        idata = pm.sample(draws=draws,tune=tune,cores=n_cores,nuts_sampler=nuts_sampler)
 
     # Consolidate results from multiple chains into a single numpy array
     ww = idata.posterior['weight'].to_numpy()
@@ -143,12 +178,21 @@ for i,league in enumerate(leagues):
     outcome_filepaths = [os.path.join(outcome_dir,x) for x in np.sort(os.listdir(outcome_dir))]
     outcome_filepaths = outcome_filepaths[-lookback_period:]
 
-    outcome_df = pd.concat(pd.read_parquet(f) for f in outcome_filepaths).reset_index(drop=True)
-
-    # Get N most recent games
-    recent_games = outcome_df[['game_date','home_team','away_team']].drop_duplicates().sort_values(by='game_date').reset_index(drop=True)
+    # Get N most recent games (only need to read columns identifying each game to determine this)
+    game_cols = ['game_date','home_team','away_team']
+    # (tables are concatenated in Arrow and converted to pandas once, rather than building a dataframe per file)
+    game_tables = [pq.read_table(f,columns=game_cols) for f in outcome_filepaths]
+    recent_games = pa.concat_tables(game_tables,promote_options='permissive').to_pandas(self_destruct=True)
+    recent_games = recent_games.drop_duplicates().sort_values(by='game_date').reset_index(drop=True)
     cutoff_date = recent_games.iloc[-n_games:]['game_date'].min()
-    outcome_df = outcome_df[outcome_df['game_date'] >= cutoff_date]
+
+    # Read in full data for recent games, skipping older rows while scanning the files
+    outcome_tables = [pq.read_table(f,filters=[('game_date','>=',cutoff_date)]) for f in outcome_filepaths]
+    outcome_df = pa.concat_tables(outcome_tables,promote_options='permissive').to_pandas(self_destruct=True)
+    del outcome_tables
+
+    # Preprocessing steps that are the same for each pre-game time interval
+    outcome_df = prepare_outcome_data(outcome_df,cutoff_date=cutoff_date,sportsbooks=sportsbooks)
 
     gc.collect()
 
@@ -162,7 +206,7 @@ for i,league in enumerate(leagues):
         hours_before = (t_lower,t_upper)
 
         # Estimate combination weights
-        v,f,y,included_books = preprocess_outcome_data(outcome_df,hours_before=hours_before,n_games=n_games,sportsbooks=sportsbooks)
+        v,f,y,included_books = preprocess_outcome_data(outcome_df,hours_before=hours_before,sportsbooks=sportsbooks)
         w_post = estimate_combination_weights(v,f,y)
 
         # Add to list of weight dataframes
@@ -183,7 +227,7 @@ for i,league in enumerate(leagues):
     # Save results
     date_str = pd.Timestamp.now().strftime('%Y-%m-%d')
     outname = os.path.join(pwd,f'data/weights/{league}/{date_str}_{league}_weights.parquet')
-    weights_df.to_parquet(outname)
+    pq.write_table(pa.Table.from_pandas(weights_df),outname,compression='zstd',use_dictionary=True,row_group_size=50000)
 
     # Free up memory
     del outcome_df
@@ -1,21 +1,10 @@
 import numpy as np
 import pandas as pd
 import rapidfuzz as rf
-import itertools
+import scipy.optimize as so
 
 ### *** Functions for implementing fuzzy-matching *** ###
 
-def distance_func(df,c1,c2):
-    """
-    Helper function to apply Jaro-Winkler distance calculation to dataframes
-
-    param: df: pandas dataframe
-    param: c1: name of column containing left string
-    param: c2: name of column containing right string
-    """
-    f = lambda x: rf.distance.JaroWinkler.distance(x[0],x[1],processor=rf.utils.default_process)
-    return df[[c1,c2]].apply(f,axis=1)
-
 def match_team_names(games1,games2,max_distance=0.67):
     """
     Fuzzy matching of team names based on Jaro-Winkler distance metric. This is useful for merging betting
@@ -32,52 +21,50 @@ def match_team_names(games1,games2,max_distance=0.67):
     It is assumed that the matchups contained in games1 are a subset of those contained in games2.
     """
 
-    # Get all potential matches of games in dataframe #1 with games in dataframe #2
-    potential_matches = pd.DataFrame(itertools.product(games1.index.values,games2.index.values),columns=['index1','index2'])
-    potential_matches[['home1','away1']] = games1.loc[potential_matches['index1'],['home_team','away_team']].values
-    potential_matches[['home2','away2']] = games2.loc[potential_matches['index2'],['home_team','away_team']].values
-
-    # Calculate Jaro-Winkler distance between matched home and away team names
-    home_distance = distance_func(potential_matches,'home1','home2')
-    away_distance = distance_func(potential_matches,'away1','away2')
-    potential_matches['distance'] = home_distance + away_distance
-    potential_matches.sort_values(by='distance',inplace=True)
-
-    matches = []
-
-    # For each iteration, select the closest matching pair of games (as measued by Jaro-Winkler distance)
-    # Then drop any remaining potential pairings that include the involved teams.
-    # Continue until all games in dataframe #1 are paired up with a game in dataframe #2.
-
-    while len(potential_matches) > 0:
-
-        best_matches = potential_matches.drop_duplicates(['home1','away1'])
-
-        best_match = potential_matches.iloc[0]
-        matches.append(best_match.to_numpy())
-
-        m1 = (potential_matches['home1']==best_match['home1'])
-        m2 = (potential_matches['home2']==best_match['home2'])
-        m3 = (potential_matches['away1']==best_match['away1'])
-        m4 = (potential_matches['away2']==best_match['away2'])
-        mask = ~(m1|m2|m3|m4)
-
-        potential_matches = potential_matches[mask]
-
-    match_df = pd.DataFrame(matches,columns=potential_matches.columns)
-    match_df = match_df[['home1','home2','away1','away2','distance']]
+    home1 = games1['home_team'].to_numpy()
+    away1 = games1['away_team'].to_numpy()
+    home2 = games2['home_team'].to_numpy()
+    away2 = games2['away_team'].to_numpy()
+
+    # Each team name only needs to be compared once, so compute distances between unique names
+    # (pooling home and away teams) and then expand to the full set of games using each game's
+    # index into the unique names
+    names1,i1 = np.unique(np.concatenate([home1,away1]),return_inverse=True)
+    names2,i2 = np.unique(np.concatenate([home2,away2]),return_inverse=True)
+    ih1,ia1 = i1[:len(home1)],i1[len(home1):]
+    ih2,ia2 = i2[:len(home2)],i2[len(home2):]
+
+    # Normalize team names once up-front and pass them to cdist without a processor,
+    # which lets rapidfuzz use its batched (SIMD) Jaro-Winkler implementation
+    names1 = [rf.utils.default_process(x) for x in names1]
+    names2 = [rf.utils.default_process(x) for x in names2]
+
+    # Calculate Jaro-Winkler distance between all pairs of home and away team names
+    # (rows correspond to games in dataframe #1, columns to games in dataframe #2)
+    name_dist = rf.process.cdist(names1,names2,scorer=rf.distance.JaroWinkler.distance,workers=-1)
+    H = name_dist[np.ix_(ih1,ih2)]
+    A = name_dist[np.ix_(ia1,ia2)]
+    D = H + A
+
+    # Pair up games in dataframe #1 with games in dataframe #2 so as to minimize the total
+    # Jaro-Winkler distance across all matchups (i.e., solve the linear assignment problem)
+    row_ind,col_ind = so.linear_sum_assignment(D)
+
+    match_df = pd.DataFrame({'home1':home1[row_ind],
+                             'home2':home2[col_ind],
+                             'away1':away1[row_ind],
+                             'away2':away2[col_ind],
+                             'distance':D[row_ind,col_ind]})
+    match_df = match_df.sort_values(by='distance').reset_index(drop=True)
 
     max_distance_criteria = (match_df['distance'] <= max_distance)
     unmatch_df = match_df[~max_distance_criteria]
     match_df = match_df[max_distance_criteria]
 
-    name_conversion_dict = {}
-
-    part1 = match_df[['home1','home2']].rename(columns={'home1':'name1','home2':'name2'})
-    part2 = match_df[['away1','away2']].rename(columns={'away1':'name1','away2':'name2'})
-
-    for index,row in pd.concat([part1,part2]).sort_values(by='name1').iterrows():
-        name_conversion_dict[row['name1']] = row['name2']
+    # Mapping of sportsbook team names to official team names
+    names1 = np.concatenate([match_df['home1'].to_numpy(),match_df['away1'].to_numpy()])
+    names2 = np.concatenate([match_df['home2'].to_numpy(),match_df['away2'].to_numpy()])
+    name_conversion_dict = dict(zip(names1,names2))
 
     return(name_conversion_dict,match_df,unmatch_df)
 
@@ -87,52 +74,86 @@ def harmonize_team_names(odds_df,schedule_df,max_hours_difference=1.5):
     param: schedule_df: dataframe listing start time, home team, and away team of upcoming games
     param: max_hours_difference: maximum allowed discrepancy in start times listed by sportsbooks versus schedule
     """
-    sportsbook_ids = odds_df['sportsbook_id'].unique()
     bad_match_indices = []
 
-    for book_id in sportsbook_ids:
+    # Mapping of (sportsbook_id, game_datetime, sportsbook team name) to official team name
+    name_conversion_dict = {}
+
+    # Game dates and team names from official league site
+    league_games = schedule_df[['game_datetime','home_team','away_team']].drop_duplicates().reset_index(drop=True)
+
+    # Work with start times as integer nanoseconds since epoch so that date comparisons
+    # inside the loop are done on plain numpy arrays rather than through pandas
+    to_ns = lambda x: pd.DatetimeIndex(x).as_unit('ns').asi8
+    league_times = to_ns(league_games['game_datetime'])
+    max_ns_difference = max_hours_difference*3600*1e9
+
+    # Split games into slices by sportsbook and start time. Each slice is matched independently.
+    # (grouping once gives the rows belonging to each slice without rescanning odds_df for every book and date)
+    slice_keys = []
+    slice_rows = []
+    slice_index = []
+
+    # Many sportsbooks list the same games under the same names, so only fuzzy-match each
+    # distinct combination of sportsbook games and candidate league games once
+    unique_slices = {}
+    slice_book_games = []
+    slice_league_games = []
+
+    for (book_id,datetime),rows in odds_df.groupby(['sportsbook_id','game_datetime'],sort=False).indices.items():
+
+        # Games occurring at specified time according to sportsbook and official league site
+        book_games = odds_df[['home_team','away_team']].iloc[rows].drop_duplicates().sort_values(by=['home_team','away_team'])
+        m2 = (np.abs(league_times - pd.Timestamp(datetime).as_unit('ns').value) <= max_ns_difference)
+
+        slice_id = (tuple(book_games['home_team']),tuple(book_games['away_team']),tuple(np.flatnonzero(m2)))
+
+        if slice_id not in unique_slices:
+            unique_slices[slice_id] = len(slice_book_games)
+            slice_book_games.append(book_games)
+            slice_league_games.append(league_games[m2])
 
-        # Game dates and team names from sportsbook
-        m_book = (odds_df['sportsbook_id']==book_id)
-        book_games = odds_df[m_book][['game_datetime','home_team','away_team']].drop_duplicates().reset_index(drop=True)
+        slice_keys.append((book_id,datetime))
+        slice_rows.append(rows)
+        slice_index.append(unique_slices[slice_id])
 
-        # Game dates and team names from official league site
-        league_games = schedule_df[['game_datetime','home_team','away_team']].drop_duplicates().reset_index(drop=True)
+    # Use fuzzy matching to harmonize sportsbook and league naming conventions
+    results = list(map(match_team_names,slice_book_games,slice_league_games))
 
-        for datetime in book_games['game_datetime'].unique():
+    for (book_id,datetime),rows,i in zip(slice_keys,slice_rows,slice_index):
 
-            # Get games occurring on specified date
-            m1 = (book_games['game_datetime']==datetime)
+        conversion_dict,match_df,unmatch_df = results[i]
 
-            hours_difference = np.abs((league_games['game_datetime'] - datetime).dt.total_seconds()/3600)
-            m2 = (hours_difference <= max_hours_difference)
+        for name1,name2 in conversion_dict.items():
+            name_conversion_dict[(book_id,datetime,name1)] = name2
 
-            # Use fuzzy matching to harmonize sportsbook and league naming conventions
-            conversion_dict,match_df,unmatch_df = match_team_names(book_games[m1],league_games[m2])
-            conversion_func = lambda x: conversion_dict[x] if x in conversion_dict.keys() else x
+        if len(unmatch_df) > 0:
+            slice_games = pd.MultiIndex.from_frame(odds_df[['home_team','away_team']].iloc[rows])
+            m_bad = slice_games.isin(list(zip(unmatch_df['home1'],unmatch_df['away1'])))
+            bad_match_indices += odds_df.index[rows[m_bad]].to_list()
 
-            if len(unmatch_df) > 0:
-                unmatch_df = unmatch_df[['home1','away1']].rename(columns={'home1':'home_team','away1':'away_team'})
-                unmatch_df['sportsbook_id'] = book_id
-                unmatch_df['game_datetime'] = datetime
-                bad_match_indices += pd.merge(odds_df[unmatch_df.columns].reset_index(),unmatch_df,how='inner',on=list(unmatch_df.columns))['index'].to_list()
+    # Convert sportsbook team names to official team names used by league in a single pass
+    # (names without a match are left unchanged)
+    conversion_map = pd.Series(name_conversion_dict,dtype=object)
 
-            # Convert sportsbook team names to official team names used by league
-            m_datetime = (odds_df['game_datetime']==datetime)
-            m_conv = m_book&m_datetime
-            odds_df.loc[m_conv,'home_team'] = odds_df.loc[m_conv,'home_team'].apply(conversion_func)
-            odds_df.loc[m_conv,'away_team'] = odds_df.loc[m_conv,'away_team'].apply(conversion_func)
+    for col in ['home_team','away_team']:
+        keys = pd.MultiIndex.from_arrays([odds_df['sportsbook_id'],odds_df['game_datetime'],odds_df[col]])
+        converted_names = pd.Series(keys.map(conversion_map),index=odds_df.index)
+        odds_df[col] = converted_names.fillna(odds_df[col])
 
     # Drop bad matches with poor agreement between sportsbook and official team names
     odds_df = odds_df[~odds_df.index.isin(bad_match_indices)].reset_index(drop=True)
 
     # Harmonize start times in case there's slight disagreement between books
     # by taking most commonly reported start time for each game
-    mode_func = lambda x: pd.Series.mode(x)[0]
-    start_times = odds_df[['game_date','home_team','away_team','game_datetime']].groupby(['game_date','home_team','away_team']).agg(mode_func).reset_index()
+    # (ties are broken in favor of the earliest start time, as with pd.Series.mode)
+    game_cols = ['game_date','home_team','away_team']
+    start_times = odds_df.groupby(game_cols+['game_datetime']).size().reset_index(name='count')
+    start_times = start_times.sort_values(by=game_cols+['count','game_datetime'],ascending=[True,True,True,False,True])
+    start_times = start_times.drop_duplicates(subset=game_cols)[game_cols+['game_datetime']]
 
     odds_df.drop(columns=['game_datetime'],inplace=True)
-    odds_df = pd.merge(odds_df,start_times,on=['game_date','home_team','away_team'],how='left')
-    odds_df['game_date'] = pd.to_datetime(odds_df['game_datetime'].dt.date)
+    odds_df = pd.merge(odds_df,start_times,on=game_cols,how='left')
+    odds_df['game_date'] = odds_df['game_datetime'].dt.tz_localize(None).dt.normalize()
 
     return(odds_df)
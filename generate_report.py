@@ -1,6 +1,6 @@
-import numpy as np
 import pandas as pd
 import datetime as dt
+import pyarrow.dataset as ds
 import os
 
 def time_since_last_modification(dir):
@@ -8,9 +8,9 @@ def time_since_last_modification(dir):
     This function looks for the most recently modified file in a directory, and
     calculates the time elapsed since it was modified.
     """
-    filepaths = [os.path.join(dir,x) for x in os.listdir(dir)]
-    timestamps = [os.path.getmtime(x) for x in filepaths]
-    modified_time = pd.Timestamp(dt.datetime.fromtimestamp(np.max(timestamps)))
+    with os.scandir(dir) as entries:
+        max_timestamp = max(entry.stat().st_mtime for entry in entries)
+    modified_time = pd.Timestamp(dt.datetime.fromtimestamp(max_timestamp))
     current_time = pd.Timestamp.now()
     delta_t = current_time - modified_time
     return(delta_t)
@@ -53,12 +53,15 @@ with open('report.txt','w') as f:
         sampling_freq = 10 # Number of minutes in between scraping of odds
         samples_per_day = int(24*60/sampling_freq)
         prob_dir = os.path.join(pwd,f'data/odds/{league}')
-        filepaths = np.sort([os.path.join(prob_dir,x) for x in os.listdir(prob_dir) if x.startswith(yesterday_date_str)])
-        odds_df = pd.concat([pd.read_parquet(filepath) for filepath in filepaths]).reset_index(drop=True)
+        with os.scandir(prob_dir) as entries:
+            filepaths = sorted(entry.path for entry in entries if entry.name.startswith(yesterday_date_str))
+
+        # Read all files as a single Arrow dataset, only decoding the two columns we need
+        odds_df = ds.dataset(filepaths,format='parquet').to_table(columns=['sportsbook_name','observation_datetime']).to_pandas(self_destruct=True)
         odds_df['observation_datetime'] = odds_df['observation_datetime'].dt.floor(f'{sampling_freq}min')
 
-        odds_df = odds_df[['sportsbook_name','observation_datetime']].dropna().drop_duplicates()
-        obs_count = odds_df.groupby('sportsbook_name').count()['observation_datetime']
+        odds_df = odds_df.dropna().drop_duplicates()
+        obs_count = odds_df.groupby('sportsbook_name').size()
         obs_percent = (100*obs_count/samples_per_day).round(1)
 
         for book in obs_count.index.values:
@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 import sportsbettingscrapers as sbs
+import concurrent.futures as cf
 import os
 
 pwd = os.getcwd()
@@ -12,33 +13,26 @@ sbs.create_folders()
 proxy_list_path = os.path.join(pwd,'proxies','proxy_list.txt')
 proxypool = sbs.ProxyPool(proxy_list_path)
 
-# *** Scrape odds data for NBA *** #
-nba_odds_df = sbs.scrape_NBA_odds(proxypool)
-print('*** Finished scraping NBA odds ***\n',flush=True)
+# Scrape odds data for each league concurrently
+leagues = ['NBA','NCAAMB']
+scrape_funcs = {'NBA':sbs.scrape_NBA_odds,'NCAAMB':sbs.scrape_NCAAMB_odds}
 
-if nba_odds_df is not None:
+with cf.ThreadPoolExecutor(max_workers=len(leagues)) as executor:
+    futures = {league:executor.submit(scrape_funcs[league],proxypool) for league in leagues}
 
-    timestamp = nba_odds_df['observation_datetime'].min()
-    timestamp_string = timestamp.replace(microsecond=0).isoformat().replace(':','.')
-    outname = os.path.join(pwd,'data/odds/NBA',timestamp_string + '_NBA_odds.parquet')
-    nba_odds_df.to_parquet(outname)
+for league in leagues:
 
-    print(nba_odds_df.head(),'\n\n',flush=True)
+    odds_df = futures[league].result()
+    print(f'*** Finished scraping {league} odds ***\n',flush=True)
 
-else:
-    print('(No live bets were found)\n\n',flush=True)
+    if odds_df is not None:
 
-# *** Scrape odds data for NCAA Division I Mens Basketball *** #
-ncaamb_odds_df = sbs.scrape_NCAAMB_odds(proxypool)
-print('*** Finished scraping NCAAMB odds ***\n',flush=True)
+        timestamp = odds_df['observation_datetime'].min()
+        timestamp_string = timestamp.replace(microsecond=0).isoformat().replace(':','.')
+        outname = os.path.join(pwd,f'data/odds/{league}',timestamp_string + f'_{league}_odds.parquet')
+        odds_df.to_parquet(outname)
 
-if ncaamb_odds_df is not None:
+        print(odds_df.head(),'\n\n',flush=True)
 
-    timestamp = ncaamb_odds_df['observation_datetime'].min()
-    timestamp_string = timestamp.replace(microsecond=0).isoformat().replace(':','.')
-    outname = os.path.join(pwd,'data/odds/NCAAMB',timestamp_string + '_NCAAMB_odds.parquet')
-    ncaamb_odds_df.to_parquet(outname)
-
-    print(ncaamb_odds_df.head(),'\n\n',flush=True)
-else:
-    print('(No live bets were found)\n\n',flush=True)
+    else:
+        print('(No live bets were found)\n\n',flush=True)
@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 import sportsbettingscrapers as sbs
+import concurrent.futures as cf
 import os
 
 pwd = os.getcwd()
@@ -12,18 +13,27 @@ sbs.create_folders()
 proxy_list_path = os.path.join(pwd,'proxies','proxy_list.txt')
 proxypool = sbs.ProxyPool(proxy_list_path)
 
-# Get updated NBA schedule
-try:
-    nba_schedule = sbs.scrape_NBA_schedule(proxypool)
-    outname = os.path.join(pwd,'data/schedule/NBA/NBA_schedule.parquet')
-    nba_schedule.to_parquet(outname)
-except:
-    pass
-
-# Get updated NCAAMB schedule
-try:
-    ncaamb_schedule = sbs.scrape_NCAAMB_schedule(proxypool)
-    outname = os.path.join(pwd,'data/schedule/NCAAMB/NCAAMB_schedule.parquet')
-    ncaamb_schedule.to_parquet(outname)
-except:
-    pass
+# Get updated schedule for each league
+leagues = ['NBA','NCAAMB']
+scrape_funcs = {'NBA':sbs.scrape_NBA_schedule,'NCAAMB':sbs.scrape_NCAAMB_schedule}
+
+def scrape_and_save(league):
+    """
+    Scrape schedule for specified league and save to file (run in worker thread so writes overlap with other scrapes)
+    """
+    schedule_df = scrape_funcs[league](proxypool)
+    outname = os.path.join(pwd,f'data/schedule/{league}/{league}_schedule.parquet')
+    schedule_df.to_parquet(outname)
+    return(None)
+
+with cf.ThreadPoolExecutor(max_workers=len(leagues)) as executor:
+
+    futures = {executor.submit(scrape_and_save,league):league for league in leagues}
+
+    # If a schedule can't be updated, keep the previously saved version but report the error
+    # (KeyboardInterrupt and other non-Exception errors are no longer swallowed)
+    for future in cf.as_completed(futures):
+        try:
+            future.result()
+        except Exception as e:
+            print(f'Could not update {futures[future]} schedule: {e!r}',flush=True)
@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 import sportsbettingscrapers as sbs
+import concurrent.futures as cf
 import os
 
 pwd = os.getcwd()
@@ -16,20 +17,25 @@ proxypool = sbs.ProxyPool(proxy_list_path)
 current_period = pd.Timestamp.now().to_period('M')
 last_period = current_period-1
 
-for period in [last_period,current_period]:
+# Pull latest data on game scores for each league and period concurrently
+leagues = ['NBA','NCAAMB']
+periods = [last_period,current_period]
+scrape_funcs = {'NBA':sbs.scrape_NBA_scores,'NCAAMB':sbs.scrape_NCAAMB_scores}
 
-    period_str = period.strftime('%Y-%m')
+# NCAAMB scores are queried one date at a time, so keep a cache of past dates to avoid re-requesting them
+scrape_kwargs = {'NBA':{},'NCAAMB':{'cache_dir':os.path.join(pwd,'data/cache/NCAAMB')}}
+
+with cf.ThreadPoolExecutor(max_workers=len(leagues)*len(periods)) as executor:
+    futures = {(period,league):executor.submit(scrape_funcs[league],proxypool,period=period,**scrape_kwargs[league]) for period in periods for league in leagues}
 
-    # *** Pull latest data on NBA game scores *** #
-    nba_scores_df = sbs.scrape_NBA_scores(proxypool,period=period)
+for period in periods:
+
+    period_str = period.strftime('%Y-%m')
 
-    if nba_scores_df is not None:
-        outname = os.path.join(pwd,'data/scores/NBA',f'{period_str}_NBA_scores.parquet')
-        nba_scores_df.to_parquet(outname)
+    for league in leagues:
 
-    #*** Pull latest data on NCAAMB game scores *** #
-    ncaamb_scores_df = sbs.scrape_NCAAMB_scores(proxypool,period=period)
+        scores_df = futures[(period,league)].result()
 
-    if ncaamb_scores_df is not None:
-        outname = os.path.join(pwd,'data/scores/NCAAMB',f'{period_str}_NCAAMB_scores.parquet')
-        ncaamb_scores_df.to_parquet(outname)
+        if scores_df is not None:
+            outname = os.path.join(pwd,f'data/scores/{league}',f'{period_str}_{league}_scores.parquet')
+            scores_df.to_parquet(outname)
@@ -1,14 +1,72 @@
 import numpy as np
-import scipy.stats as stats
-import scipy.optimize as so
 import pandas as pd
 import datetime as dt
 import requests
+import orjson
 import time
+import re
+import random
 import icalendar
 import string
+import concurrent.futures as cf
 import os
 
+# *** Request headers and sportsbook ids *** #
+
+# Headers sent with requests to actionnetwork.com scoreboard API
+ACTIONNETWORK_HEADERS = {'Accept': '*/*',
+                         'Accept-Encoding': 'gzip, deflate, br',
+                         'Accept-Language': 'en-US,en;q=0.9',
+                         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
+                        }
+
+# Dicionary of actionnetwork.com sportsbook names/ids
+ACTIONNETWORK_BOOK_NAMES = {'15':pd.NA,
+                            '30':pd.NA,
+                            '75':'BetMGM NJ',
+                            '123':'Caesars NJ',
+                            '2887':'Fanatics NC',
+                            '2888':'FanDuel NC',
+                            '2889':'BetMGM NC',
+                            '2890':'ESPNBet NC',
+                            '3118':'DraftKings NC',
+                            '3120':'Caesars NC',
+                            '2891':'Bet365 NC'}
+
+# Columns of betting line records parsed from actionnetwork.com
+ACTIONNETWORK_COLUMNS = ['game_datetime','game_date','home_team','away_team','sportsbook_name','sportsbook_id',
+                         'moneyline_home_odds','moneyline_away_odds',
+                         'spread_home_value','spread_away_value','spread_home_odds','spread_away_odds',
+                         'over_value','under_value','over_odds','under_odds']
+
+# Headers sent with requests to stats.nba.com
+NBA_STATS_HEADERS = {'Accept': '*/*',
+                     'Accept-Encoding': 'gzip, deflate, br',
+                     'Accept-Language': 'en-US,en;q=0.9',
+                     'Host': 'stats.nba.com',
+                     'Origin': 'https://www.nba.com',
+                     'Referer': 'https://www.nba.com/',
+                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
+                    }
+
+# Headers sent with requests to data.ncaa.com
+NCAA_HEADERS = {'accept':'application/json, text/javascript, */*; q=0.01',
+                'accept-encoding':'gzip, deflate, br, zstd',
+                'accept-language':'en-US,en;q=0.9',
+                'origin':'https://www.ncaa.com',
+                'priority':'u=1, i',
+                'referer':'https://www.ncaa.com/',
+                'sec-ch-ua':'"Chromium";v="130", "Google Chrome";v="130", "Not?A_Brand";v="99"',
+                'sec-ch-ua-mobile':'?0',
+                'sec-ch-ua-platform':"Windows",
+                'sec-fetch-dest':'empty',
+                'sec-fetch-mode':'cors',
+                'sec-fetch-site':'same-site',
+                'user-agent':'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36'}
+
+# strftime format of data.ncaa.com scoreboard urls for men's D1 basketball
+NCAAMB_SCOREBOARD_URL_FORMAT = 'https://data.ncaa.com/casablanca/scoreboard/basketball-men/d1/%Y/%m/%d/scoreboard.json'
+
 # *** Initial setup *** #
 
 def create_folders(leagues=['NBA','NCAAMB','NCAAWB']):
@@ -38,6 +96,19 @@ def create_folders(leagues=['NBA','NCAAMB','NCAAWB']):
 
     return(None)
 
+def list_timestamps(dirpath):
+    """
+    Function to list the timestamps of parquet files saved in a data directory
+
+    param: dirpath: path to directory of files named as "{timestamp}_{league}_{datatype}.parquet"
+    returns: timestamps: sorted list of timestamp strings
+    """
+
+    with os.scandir(dirpath) as entries:
+        timestamps = sorted(entry.name.partition('_')[0] for entry in entries if entry.name.endswith('.parquet'))
+
+    return(timestamps)
+
 # *** Functions to calculate odds-implied probability *** #
 
 def convert_american_to_decimal(american_odds):
@@ -47,13 +118,26 @@ def convert_american_to_decimal(american_odds):
     """
 
     if american_odds < 0: # Negative odds (e.g., bet $110 to make $100)
-        decimal_odds = 1 + 100/np.abs(american_odds)
+        decimal_odds = 1 + 100/abs(american_odds)
 
     else: # Positive odds (e.g., bet $100 to make $110)
         decimal_odds = 1 + american_odds/100
 
     return(decimal_odds)
 
+def convert_american_to_decimal_vec(american_odds):
+    """
+    Vectorized version of convert_american_to_decimal that operates on an array of American odds
+    """
+
+    american_odds = np.asarray(american_odds,dtype=float)
+
+    # Negative odds pay out 100/|odds| per dollar, positive odds pay out odds/100 per dollar
+    with np.errstate(divide='ignore'):
+        decimal_odds = np.where(american_odds < 0,1 + 100/np.abs(american_odds),1 + american_odds/100)
+
+    return(decimal_odds)
+
 def convert_decimal_to_american(decimal_odds):
     """
     Helper function to convert decimal odds into American odds
@@ -66,7 +150,20 @@ def convert_decimal_to_american(decimal_odds):
 
     return(american_odds)
 
-def calculate_implied_probability(odds_data):
+def convert_decimal_to_american_vec(decimal_odds):
+    """
+    Vectorized version of convert_decimal_to_american that operates on an array of decimal odds
+    """
+
+    decimal_odds = np.asarray(decimal_odds,dtype=float)
+
+    # Odds paying out at least even money are positive, odds paying out less are negative
+    with np.errstate(divide='ignore'):
+        american_odds = np.where(decimal_odds >= 2.0,100*(decimal_odds-1),-100/(decimal_odds-1))
+
+    return(american_odds)
+
+def calculate_implied_probability(odds_data,tol=1.48e-8,maxiter=50):
     """
     Calculate the implied probability of each event after removing vig using power method.
 
@@ -75,31 +172,51 @@ def calculate_implied_probability(odds_data):
     https://pdfs.semanticscholar.org/713d/3cb2e10dec3183ea5feced45bb11097fe702.pdf
 
     param: odds_data: numpy array of decimal odds. Each row corresponds to a game, and each column corresponds to a team.
+    param: tol: convergence tolerance on the change in k between iterations
+    param: maxiter: maximum number of iterations
     param: p: implied probability after removing vig using power method.
     """
 
-    p = np.zeros(odds_data.shape)
+    # Logs of the raw implied probabilities don't depend on k, so only compute them once
+    p_book = 1/np.asarray(odds_data,dtype=float)
+    log_p_book = np.log(p_book)
+    log_p_book_sq = log_p_book**2
 
-    for i,decimal_odds in enumerate(odds_data):
+    # Numerically solve for k using Halley's method (the same update used by scipy.optimize.newton
+    # when given first and second derivatives), applied to all games at once rather than one at a time
+    n = p_book.shape[0]
+    k = np.ones(n)
+    converged = np.zeros(n,dtype=bool)
 
-        p_book = 1/decimal_odds
+    for i in range(maxiter):
 
-        f = lambda k: 1 - np.sum(p_book**k)
-        fprime = lambda k: -1*np.sum(p_book**k*np.log(p_book))
-        fprime2 = lambda k: -1*np.sum(p_book**k*np.log(p_book)**2)
+        pk = p_book**k[:,None]
+        f = 1 - np.sum(pk,axis=1)
+        fprime = -1*np.sum(pk*log_p_book,axis=1)
+        fprime2 = -1*np.sum(pk*log_p_book_sq,axis=1)
 
-        # Numerically solve for k using Newton's method
-        k_guess = 1.0
-        k = so.newton(f,k_guess,fprime=fprime,fprime2=fprime2)
+        step = f/fprime
+        adj = step*fprime2/fprime/2
+        step = np.where(np.abs(adj) < 1,step/(1 - adj),step)
 
-        p[i,:] = p_book**k
+        # Leave k unchanged for games that have already converged
+        step[converged] = 0
+        k -= step
+        converged |= (np.abs(step) <= tol)
+
+        if np.all(converged):
+            break
+    else:
+        raise RuntimeError(f'Failed to converge after {maxiter} iterations for {np.sum(~converged)} games.')
+
+    p = p_book**k[:,None]
 
     return(p)
 
 def calculate_vig(p,q):
     """
-    param: p: decimal odds of event occurring
-    param: q: decimal odds of event not occurring
+    param: p: decimal odds of event occurring (scalar or numpy array)
+    param: q: decimal odds of event not occurring (scalar or numpy array)
     returns: v: calculated vigorish (i.e., return to bookmaker)
     """
     v = 1 - p*q/(p+q)
@@ -113,13 +230,25 @@ class ProxyPool:
         """
         param: proxy_list_path: path to list of proxies downloaded form webshare.io
         """
-        proxy_list = list(np.loadtxt(proxy_list_path,dtype=str))
-        proxy_list = ['http://' + ':'.join(x.split(':')[2:]) + '@' + ':'.join(x.split(':')[:2]) for x in proxy_list]
+        with open(proxy_list_path) as f:
+            proxy_list = [line.strip() for line in f if line.strip()]
+
+        # Each line has the form host:port:username:password (split once, keeping any colons in the password)
+        proxy_list = [x.split(':',2) for x in proxy_list]
+        proxy_list = [f'http://{auth}@{host}:{port}' for host,port,auth in proxy_list]
         proxy_list = [{'http':x,'https':x} for x in proxy_list]
 
         self.proxy_list = proxy_list
         self.num_proxies = len(self.proxy_list)
-        self.random_index = stats.randint(0,self.num_proxies).rvs
+
+        # Shared session so that connections (and TLS handshakes) to each host are kept alive
+        # and reused across requests. requests.Session is not documented as thread-safe; it is shared
+        # across worker threads because the urllib3 connection pools behind the adapter are, and
+        # callers pass headers/proxies per request rather than relying on any session state.
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=32,pool_maxsize=32)
+        self.session.mount('https://',adapter)
+        self.session.mount('http://',adapter)
 
     def verify_ip_addresses(self,sleep_seconds=0.1,nmax=10):
 
@@ -127,38 +256,46 @@ class ProxyPool:
         Function to verify that IP address appears as those of proxies
         """
         url = 'https://api.ipify.org/'
-        n = np.min([nmax,len(self.proxy_list)])
+        n = min(nmax,len(self.proxy_list))
 
         for i in range(n):
 
-            res = requests.get(url,proxies=self.proxy_list[i])
+            res = self.session.get(url,proxies=self.proxy_list[i])
             print(res.text,flush=True)
             time.sleep(sleep_seconds)
 
         return(None)
 
-    def remove_bad_proxies(self,sleep_seconds=0.1):
+    def remove_bad_proxies(self,sleep_seconds=0.1,timeout=5,max_workers=32):
         """
         Function to remove non-working proxies from list
+
+        param: sleep_seconds: number of seconds each worker waits after checking a proxy
+        param: timeout: number of seconds to wait for a response before treating a proxy as non-working
+        param: max_workers: number of proxies to check concurrently
         """
 
         url = 'https://api.ipify.org/'
-        working_proxies = []
 
         n_start = self.num_proxies
 
-        for proxy in self.proxy_list:
-
+        def is_working(proxy):
             try:
-                res = requests.get(url,proxies=proxy)
-                working_proxies.append(proxy)
-            except:
-                pass
+                self.session.get(url,proxies=proxy,timeout=timeout)
+                working = True
+            except requests.RequestException:
+                working = False
             time.sleep(sleep_seconds)
+            return(working)
+
+        # Check proxies concurrently since each check is spent waiting on the network
+        with cf.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            working_list = list(executor.map(is_working,self.proxy_list))
+
+        working_proxies = [proxy for proxy,working in zip(self.proxy_list,working_list) if working]
 
         self.proxy_list = working_proxies
         self.num_proxies = len(self.proxy_list)
-        self.random_index = stats.randint(0,self.num_proxies).rvs
 
         n_remove  = n_start - self.num_proxies
 
@@ -172,161 +309,185 @@ class ProxyPool:
         Function to return a randomly-selected proxy server from self.proxy_list
         """
 
-        proxy = self.proxy_list[self.random_index()]
+        proxy = random.choice(self.proxy_list)
 
         return(proxy)
 
 
 # *** Helper functions to parse data scraped from Action Network and Pinnacle *** #
 
+def order_market_sides(outcomes,key,value):
+    """
+    Helper function to order the two sides of a betting market listed by actionnetwork.com
+
+    param: outcomes: list of outcomes offered in market (e.g., book['moneyline'])
+    param: key: field identifying the side of each outcome (e.g., 'team_id' or 'side')
+    param: value: value of key for the side that should be listed first (e.g., home team id or 'over')
+    returns: first,second: outcomes for each side of market (empty dictionaries if market is not offered)
+    """
+
+    # Look up market with dictionary methods rather than catching exceptions, since
+    # books frequently don't offer every market and raising an exception is expensive
+    if not outcomes or len(outcomes) < 2:
+        return({},{})
+
+    i = 0 if outcomes[0].get(key) == value else 1
+
+    return(outcomes[i],outcomes[1-i])
+
 def parse_actionnetwork(game):
     """
     param: game: dictionary of odds information for specific event
+    returns: records: list of tuples describing the betting lines offered by each sportsbook (see ACTIONNETWORK_COLUMNS)
     """
 
     # Get start time of match
-    start_time = pd.to_datetime(game['start_time']).tz_convert('America/New_York')
+    # (left as a UTC string here and parsed for all games at once by the calling scraper)
+    start_time = game['start_time']
 
     # Get names/abbreviations of each team
     ht_id = game['home_team_id']
-    at_id = game['away_team_id']
 
-    if game['teams'][0]['id'] == ht_id:
-        ht_name = game['teams'][0]['full_name']
-        at_name = game['teams'][1]['full_name']
-    else:
-        ht_name = game['teams'][1]['full_name']
-        at_name = game['teams'][0]['full_name']
-
-    book_id_list = []
-    book_name_list = []
-    moneyline_home_odds_list = []
-    moneyline_away_odds_list = []
-    spread_home_value_list = []
-    spread_away_value_list = []
-    spread_home_odds_list = []
-    spread_away_odds_list = []
-    over_value_list = []
-    under_value_list = []
-    over_odds_list = []
-    under_odds_list = []
-
-    # Dicionary of sportsbook names/ids
-    book_id_names = {'15':pd.NA,
-                     '30':pd.NA,
-                     '75':'BetMGM NJ',
-                     '123':'Caesars NJ',
-                     '2887':'Fanatics NC',
-                     '2888':'FanDuel NC',
-                     '2889':'BetMGM NC',
-                     '2890':'ESPNBet NC',
-                     '3118':'DraftKings NC',
-                     '3120':'Caesars NC',
-                     '2891':'Bet365 NC'}
-
-
-    for book_id in game['markets'].keys():
-
-        if book_id in book_id_names.keys():
-            book_name = book_id_names[book_id]
-        else:
-            book_name = pd.NA
+    teams = game['teams']
+    i = 0 if teams[0]['id'] == ht_id else 1
+    ht_name = teams[i]['full_name']
+    at_name = teams[1-i]['full_name']
 
-        book = game['markets'][book_id]['event']
+    # Betting lines offered by each sportsbook (one record per book)
+    records = []
+
+    for book_id,market in game['markets'].items():
+
+        book_name = ACTIONNETWORK_BOOK_NAMES.get(book_id,pd.NA)
+        book = market['event']
 
         # Get information on moneyline bet odds
-        try:
-            if book['moneyline'][0]['team_id'] == ht_id:
-                moneyline_home_odds = book['moneyline'][0]['odds']
-                moneyline_away_odds = book['moneyline'][1]['odds']
-            else:
-                moneyline_home_odds = book['moneyline'][1]['odds']
-                moneyline_away_odds = book['moneyline'][0]['odds']
-        except:
-            moneyline_home_odds = pd.NA
-            moneyline_away_odds = pd.NA
+        home,away = order_market_sides(book.get('moneyline'),'team_id',ht_id)
+        moneyline_home_odds = home.get('odds',pd.NA)
+        moneyline_away_odds = away.get('odds',pd.NA)
 
         # Get information on spread bet odds
-        try:
-            if book['spread'][0]['team_id'] == ht_id:
-                spread_home_value = book['spread'][0]['value']
-                spread_home_odds = book['spread'][0]['odds']
-                spread_away_value = book['spread'][1]['value']
-                spread_away_odds = book['spread'][1]['odds']
+        home,away = order_market_sides(book.get('spread'),'team_id',ht_id)
+        spread_home_value = home.get('value',pd.NA)
+        spread_home_odds = home.get('odds',pd.NA)
+        spread_away_value = away.get('value',pd.NA)
+        spread_away_odds = away.get('odds',pd.NA)
 
-            else:
-                spread_home_value = book['spread'][1]['value']
-                spread_home_odds = book['spread'][1]['odds']
-                spread_away_value = book['spread'][0]['value']
-                spread_away_odds = book['spread'][0]['odds']
-        except:
-            spread_home_value = pd.NA
-            spread_home_odds = pd.NA
-            spread_away_value = pd.NA
-            spread_away_odds = pd.NA
+        # Get information on over/under bet odds
+        over,under = order_market_sides(book.get('total'),'side','over')
+        over_value = over.get('value',pd.NA)
+        over_odds = over.get('odds',pd.NA)
+        under_value = under.get('value',pd.NA)
+        under_odds = under.get('odds',pd.NA)
 
+        # (fields are listed in the same order as ACTIONNETWORK_COLUMNS)
+        records.append((start_time,pd.NA,ht_name,at_name,book_name,book_id,
+                        moneyline_home_odds,moneyline_away_odds,
+                        spread_home_value,spread_away_value,spread_home_odds,spread_away_odds,
+                        over_value,under_value,over_odds,under_odds))
+
+    return(records)
+
+def fetch_actionnetwork(url,proxypool,sleep_seconds=0.1,random_pause=0.1,failure_limit=5,timeout=10):
+    """
+    Helper function to query actionnetwork.com scoreboard API, reattempting if request fails
+
+    param: url: scoreboard API url for a specific league and date
+    param: proxypool: pool of proxies to route requests through
+    param: sleep_seconds: number of seconds to wait after each api query
+    param: random_pause: total seconds between queries = sleep_seconds + uniform[0,random_pause]
+    param: failure_limit: number of times to reattempt scraping if initial request fails
+    param: timeout: number of seconds to wait for a response before counting the attempt as a failure
+    returns: results_dict: dictionary of scoreboard data (None if all attempts failed)
+    returns: observation_datetime: time at which data was retrieved
+    """
+
+    num_failures=0
+
+    while num_failures < failure_limit:
 
-        # Get information on over/under bet odds
         try:
-            if book['total'][0]['side'] == 'over':
-                over_value = book['total'][0]['value']
-                over_odds = book['total'][0]['odds']
-                under_value = book['total'][1]['value']
-                under_odds = book['total'][1]['odds']
+            res = proxypool.session.get(url,headers=ACTIONNETWORK_HEADERS,proxies=proxypool.random_proxy(),timeout=timeout)
+            time.sleep(sleep_seconds + random.uniform(0,random_pause))
+
+            if res.ok:
+                results_dict = orjson.loads(res.content)
+                observation_datetime = pd.Timestamp.now(tz='America/New_York')
+                return(results_dict,observation_datetime)
             else:
-                over_value = book['total'][1]['value']
-                over_odds = book['total'][1]['odds']
-                under_value = book['total'][0]['value']
-                under_odds = book['total'][0]['odds']
-        except:
-            over_value = pd.NA
-            over_odds = pd.NA
-            under_value = pd.NA
-            under_odds = pd.NA
-
-        book_id_list.append(book_id)
-        book_name_list.append(book_name)
-        moneyline_home_odds_list.append(moneyline_home_odds)
-        moneyline_away_odds_list.append(moneyline_away_odds)
-        spread_home_value_list.append(spread_home_value)
-        spread_away_value_list.append(spread_away_value)
-        spread_home_odds_list.append(spread_home_odds)
-        spread_away_odds_list.append(spread_away_odds)
-        over_value_list.append(over_value)
-        under_value_list.append(under_value)
-        over_odds_list.append(over_odds)
-        under_odds_list.append(under_odds)
-
-    data = {'game_datetime':start_time,
-            'game_date':pd.NA,
-            'home_team':ht_name,
-            'away_team':at_name,
-            'sportsbook_name':book_name_list,
-            'sportsbook_id':book_id_list,
-            'moneyline_home_odds':moneyline_home_odds_list,
-            'moneyline_away_odds':moneyline_away_odds_list,
-            'spread_home_value':spread_home_value_list,
-            'spread_away_value':spread_away_value_list,
-            'spread_home_odds':spread_home_odds_list,
-            'spread_away_odds':spread_home_odds_list,
-            'over_value':over_value_list,
-            'under_value':under_value_list,
-            'over_odds':over_odds_list,
-            'under_odds':under_odds_list}
-
-    df = pd.DataFrame(data)
-    df['game_date'] = pd.to_datetime(df['game_datetime'].dt.date)
+                num_failures += 1
+        except Exception as e:
+            print(e,flush=True)
+            num_failures += 1
 
-    return(df)
+    return(None,None)
+
+def scrape_actionnetwork(url_template,proxypool,sleep_seconds=0.1,random_pause=0.1,days_ahead=3,failure_limit=5,drop_started_games=False):
+    """
+    Scraper to pull data on live odds for a specific league from actionnetwork.com
+
+    param: url_template: scoreboard API url for league, with a {query_date} placeholder for the date (YYYYMMDD)
+    param: proxypool: pool of proxies to route requests through
+    param: sleep_seconds: number of seconds to wait in between api queries
+    param: random_pause: total seconds between queries = sleep_seconds + uniform[0,random_pause]
+    param: days_ahead: number of days in advance to check for newly released odds
+    param: failure_limit: number of times to reattempt scraping if initial request fails
+    param: drop_started_games: if True, drop betting lines for games that have already started
+    returns: odds_df: dataframe of betting lines offered by each sportsbook (None if no lines were found)
+    """
+
+    start_date = pd.Timestamp.now(tz='America/New_York')
+    query_dates = [(start_date + dt.timedelta(days=i)).strftime('%Y%m%d') for i in range(days_ahead+1)]
+
+    # Records of betting lines across all query dates (converted to a dataframe once at the end)
+    records = []
+    observation_datetime_list = []
+
+    urls = [url_template.format(query_date=query_date) for query_date in query_dates]
+
+    fetch = lambda url: fetch_actionnetwork(url,proxypool,sleep_seconds=sleep_seconds,random_pause=random_pause,failure_limit=failure_limit)
+
+    with cf.ThreadPoolExecutor(max_workers=min(16,len(urls))) as executor:
+        responses = list(executor.map(fetch,urls))
+
+    for results_dict,observation_datetime in responses:
+
+        if results_dict is not None:
+
+            for game in results_dict['games']:
+
+                game_records = parse_actionnetwork(game)
+                records += game_records
+                observation_datetime_list += [observation_datetime]*len(game_records)
+
+    if len(records) == 0:
+        return(None)
+
+    # Records are plain tuples, so the dataframe is built without looking up keys row by row
+    odds_df = pd.DataFrame.from_records(records,columns=ACTIONNETWORK_COLUMNS)
+    odds_df.insert(0,'observation_datetime',observation_datetime_list)
+    odds_df['game_datetime'] = pd.to_datetime(odds_df['game_datetime'],utc=True,format='ISO8601').dt.tz_convert('America/New_York')
+
+    # Local calendar date of each game (stays in datetime64 rather than going through python date objects)
+    odds_df['game_date'] = odds_df['game_datetime'].dt.tz_localize(None).dt.normalize()
+
+    if drop_started_games:
+
+        # Drop games that have already started
+        odds_df = odds_df[odds_df['game_datetime'] > odds_df['observation_datetime']].reset_index(drop=True)
+
+        if len(odds_df) == 0:
+            return(None)
+
+    return(odds_df)
 
 def generate_random_string(length=32):
     """
     Helper function to generate a random alphanumeric (base62) string of given length
     """
-    alphabet = np.array(list(string.digits + string.ascii_uppercase + string.ascii_lowercase))
-    n=len(alphabet)
-    random_string = ''.join(alphabet[stats.randint(0,n).rvs(length)])
-    
+    alphabet = string.digits + string.ascii_uppercase + string.ascii_lowercase
+    random_string = ''.join(random.choices(alphabet,k=length))
+
     return(random_string)
 
 def parse_pinnacle(matchups_results_dict,markets_results_dict):
@@ -337,95 +498,72 @@ def parse_pinnacle(matchups_results_dict,markets_results_dict):
     
     # Get information on matchup IDs, which we can use to join betting lines to specific games
     matchups_list = [x for x in matchups_results_dict if x['type']=='matchup']
-    matchup_ids = [x['id'] for x in matchups_list]
+    matchup_ids = set(x['id'] for x in matchups_list)
     markets_list = [x for x in markets_results_dict if x['matchupId'] in matchup_ids and not x['isAlternate']]
     markets_list = [x for x in markets_list if x['period']==0]
-    
-    # Create dataframe where each row corresponds to a given game
-    matchup_id_list = []
-    game_datetime_list = []
-    home_team_list = []
-    away_team_list = []
 
-    for matchup in matchups_list:
+    observation_datetime = pd.Timestamp.now(tz='America/New_York')
 
-        matchup_id_list.append(matchup['id'])
-        game_datetime_list.append(matchup['startTime'])
+    # Create a record for each game, keyed by matchup ID so that betting lines can be filled in
+    # directly (rather than assigning into a dataframe one cell at a time)
+    records = {}
 
-        if (matchup['participants'][0]['alignment']=='home'):
-            home_team_list.append(matchup['participants'][0]['name'])
-            away_team_list.append(matchup['participants'][1]['name'])
-        else:
-            home_team_list.append(matchup['participants'][1]['name'])
-            away_team_list.append(matchup['participants'][0]['name'])
+    for matchup in matchups_list:
 
-    d = {'matchup_id':matchup_id_list,
-         'observation_datetime':pd.Timestamp.now(tz='America/New_York'),
-         'game_datetime':game_datetime_list,
-         'game_date':pd.NA,
-         'home_team':home_team_list,
-         'away_team':away_team_list,
-         'sportsbook_name':'Pinnacle',
-         'sportsbook_id':'-1',
-         'moneyline_home_odds':pd.NA,
-         'moneyline_away_odds':pd.NA,
-         'spread_home_value':pd.NA,
-         'spread_away_value':pd.NA,
-         'spread_home_odds':pd.NA,
-         'spread_away_odds':pd.NA,
-         'over_value':pd.NA,
-         'under_value':pd.NA,
-         'over_odds':pd.NA,
-         'under_odds':pd.NA}
-
-    odds_df = pd.DataFrame(data=d)
-    odds_df['game_datetime'] = pd.to_datetime(odds_df['game_datetime']).dt.tz_convert('America/New_York')
-    odds_df['game_date'] = pd.to_datetime(odds_df['game_datetime'].dt.date)
+        participants = matchup['participants']
+        i = 0 if participants[0]['alignment']=='home' else 1
+
+        records[matchup['id']] = {'observation_datetime':observation_datetime,
+                                  'game_datetime':matchup['startTime'],
+                                  'game_date':pd.NA,
+                                  'home_team':participants[i]['name'],
+                                  'away_team':participants[1-i]['name'],
+                                  'sportsbook_name':'Pinnacle',
+                                  'sportsbook_id':'-1',
+                                  'moneyline_home_odds':pd.NA,
+                                  'moneyline_away_odds':pd.NA,
+                                  'spread_home_value':pd.NA,
+                                  'spread_away_value':pd.NA,
+                                  'spread_home_odds':pd.NA,
+                                  'spread_away_odds':pd.NA,
+                                  'over_value':pd.NA,
+                                  'under_value':pd.NA,
+                                  'over_odds':pd.NA,
+                                  'under_odds':pd.NA}
 
     # Now use matchup ID field to attach betting line information
-    odds_df.set_index('matchup_id',inplace=True)
-    
     for market in markets_list:
-    
-        index = market['matchupId']
+
+        record = records[market['matchupId']]
         bet_type = market['type']
-        
+        prices = market['prices']
+
         if bet_type == 'moneyline':
 
-            if (market['prices'][0]['designation']=='home'):
-                odds_df.loc[index,'moneyline_home_odds'] = market['prices'][0]['price']
-                odds_df.loc[index,'moneyline_away_odds'] = market['prices'][1]['price']
-            else:
-                odds_df.loc[index,'moneyline_home_odds'] = market['prices'][1]['price']
-                odds_df.loc[index,'moneyline_away_odds'] = market['prices'][0]['price']
+            i = 0 if prices[0]['designation']=='home' else 1
+            record['moneyline_home_odds'] = prices[i]['price']
+            record['moneyline_away_odds'] = prices[1-i]['price']
 
         elif bet_type == 'spread':
 
-            if (market['prices'][0]['designation']=='home'):
-                odds_df.loc[index,'spread_home_value'] = market['prices'][0]['points']
-                odds_df.loc[index,'spread_home_odds'] = market['prices'][0]['price']
-                odds_df.loc[index,'spread_away_value'] = market['prices'][1]['points']
-                odds_df.loc[index,'spread_away_odds'] = market['prices'][1]['price']
-            else:
-                odds_df.loc[index,'spread_home_value'] = market['prices'][1]['points']
-                odds_df.loc[index,'spread_home_odds'] = market['prices'][1]['price']
-                odds_df.loc[index,'spread_away_value'] = market['prices'][0]['points']
-                odds_df.loc[index,'spread_away_odds'] = market['prices'][0]['price']
+            i = 0 if prices[0]['designation']=='home' else 1
+            record['spread_home_value'] = prices[i]['points']
+            record['spread_home_odds'] = prices[i]['price']
+            record['spread_away_value'] = prices[1-i]['points']
+            record['spread_away_odds'] = prices[1-i]['price']
 
         elif bet_type == 'total':
-            if (market['prices'][0]['designation']=='over'):
-                odds_df.loc[index,'over_value'] = market['prices'][0]['points']
-                odds_df.loc[index,'over_odds'] = market['prices'][0]['price']
-                odds_df.loc[index,'under_value'] = market['prices'][1]['points']
-                odds_df.loc[index,'under_odds'] = market['prices'][1]['price']
-            else:
-                odds_df.loc[index,'over_value'] = market['prices'][1]['points']
-                odds_df.loc[index,'over_odds'] = market['prices'][1]['price']
-                odds_df.loc[index,'under_value'] = market['prices'][0]['points']
-                odds_df.loc[index,'under_odds'] = market['prices'][0]['price']
-                
-    odds_df = odds_df.reset_index(drop=True)
-    
+
+            i = 0 if prices[0]['designation']=='over' else 1
+            record['over_value'] = prices[i]['points']
+            record['over_odds'] = prices[i]['price']
+            record['under_value'] = prices[1-i]['points']
+            record['under_odds'] = prices[1-i]['price']
+
+    odds_df = pd.DataFrame(list(records.values()))
+    odds_df['game_datetime'] = pd.to_datetime(odds_df['game_datetime']).dt.tz_convert('America/New_York')
+    odds_df['game_date'] = odds_df['game_datetime'].dt.tz_localize(None).dt.normalize()
+
     return(odds_df)
 
 # *** National Baseketball Association (NBA) *** #
@@ -442,67 +580,12 @@ def scrape_NBA_odds_actionnetwork(proxypool,sleep_seconds=0.1,random_pause=0.1,d
     param: failure_limit: number of times to reattempt scraping if initial request fails
     """
 
-    dist = stats.uniform(0,random_pause)
-
-    start_date = pd.Timestamp.now(tz='America/New_York')
-    end_date = start_date + pd.Timedelta(days=days_ahead)
-    query_dates = [x.strftime('%Y%m%d') for x in pd.date_range(start_date,end_date,freq='D')]
-
-    result_list = []
-
-    for query_date in query_dates:
-
-        url = f'https://api.actionnetwork.com/web/v2/scoreboard/nba?bookIds=15,30,2889,3120,3118,2890,2888,2887,2891,75,123&date={query_date}&periods=event'
-
-        headers = {'Accept': '*/*',
-                   'Accept-Encoding': 'gzip, deflate, br',
-                   'Accept-Language': 'en-US,en;q=0.9',
-                   'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
-                  }
-
-        num_failures=0
-        success=False
-
-        while num_failures < failure_limit:
-
-            try:
-                res = requests.get(url,headers=headers,proxies=proxypool.random_proxy())
-                time.sleep(sleep_seconds + dist.rvs())
-
-                if res.ok:
-                    results_dict = res.json()
-                    observation_datetime = pd.Timestamp.now(tz='America/New_York')
-                    success = True
-                    break
-                else:
-                    num_failures += 1
-            except Exception as e:
-                print(e,flush=True)
-                num_failures += 1
-
-        if success:
-            if len(results_dict['games']) > 0:
-
-                current_odds_list = []
-
-                for game in results_dict['games']:
-
-                    current_odds_list.append(parse_actionnetwork(game))
+    url_template = 'https://api.actionnetwork.com/web/v2/scoreboard/nba?bookIds=15,30,2889,3120,3118,2890,2888,2887,2891,75,123&date={query_date}&periods=event'
 
-                current_odds = pd.concat(current_odds_list)
-                current_odds.insert(0, 'observation_datetime', observation_datetime)
+    odds_df = scrape_actionnetwork(url_template,proxypool,sleep_seconds=sleep_seconds,random_pause=random_pause,days_ahead=days_ahead,failure_limit=failure_limit)
 
-                result_list.append(current_odds)
-
-    if len(result_list) > 0:
-
-        odds_df = pd.concat(result_list)
-
-        return odds_df
+    return(odds_df)
 
-    else:
-        return None
-    
 def scrape_NBA_odds_pinnacle(proxypool,sleep_seconds=0.1,random_pause=0.1,failure_limit=10):
 
     """
@@ -514,8 +597,6 @@ def scrape_NBA_odds_pinnacle(proxypool,sleep_seconds=0.1,random_pause=0.1,failur
     param: failure_limit: number of times to reattempt scraping if initial request fails
     """
 
-    dist = stats.uniform(0,random_pause)
-
     matchups_url = 'https://guest.api.arcadia.pinnacle.com/0.1/leagues/487/matchups?brandId=0'
     markets_url = 'https://guest.api.arcadia.pinnacle.com/0.1/leagues/487/markets/straight'
 
@@ -532,11 +613,11 @@ def scrape_NBA_odds_pinnacle(proxypool,sleep_seconds=0.1,random_pause=0.1,failur
     # Scrape matchups information
     while num_failures < failure_limit:
         try: 
-            res = requests.get(url=matchups_url,headers=headers,proxies=proxypool.random_proxy())
-            time.sleep(sleep_seconds + dist.rvs())
+            res = proxypool.session.get(url=matchups_url,headers=headers,proxies=proxypool.random_proxy())
+            time.sleep(sleep_seconds + random.uniform(0,random_pause))
 
             if res.ok:
-                matchups_results_dict = res.json()
+                matchups_results_dict = orjson.loads(res.content)
                 break
             else:
                 num_failures += 1
@@ -549,11 +630,11 @@ def scrape_NBA_odds_pinnacle(proxypool,sleep_seconds=0.1,random_pause=0.1,failur
 
         try:
             headers['x-api-key'] = generate_random_string(32)
-            res = requests.get(url=markets_url,headers=headers,proxies=proxypool.random_proxy())
-            time.sleep(sleep_seconds + dist.rvs())
+            res = proxypool.session.get(url=markets_url,headers=headers,proxies=proxypool.random_proxy())
+            time.sleep(sleep_seconds + random.uniform(0,random_pause))
 
             if res.ok:
-                markets_results_dict = res.json()
+                markets_results_dict = orjson.loads(res.content)
                 break
             else:
                 num_failures += 1
@@ -575,13 +656,12 @@ def scrape_NBA_odds(proxypool):
     param: proxypool: pool of proxies to route requests through
     """
     
-    odds_df_list = []
-    
-    # Scrape actionnetwork.com
-    odds_df_list.append(scrape_NBA_odds_actionnetwork(proxypool))
-    
-    # Scrape pinnacle.com
-    odds_df_list.append(scrape_NBA_odds_pinnacle(proxypool))
+    # Scrape actionnetwork.com and pinnacle.com at the same time, since each spends
+    # most of its time waiting on network requests
+    with cf.ThreadPoolExecutor(max_workers=2) as executor:
+        actionnetwork_future = executor.submit(scrape_NBA_odds_actionnetwork,proxypool)
+        pinnacle_future = executor.submit(scrape_NBA_odds_pinnacle,proxypool)
+        odds_df_list = [actionnetwork_future.result(),pinnacle_future.result()]
     
     # Concatenate results 
     odds_df_list = [x for x in odds_df_list if x is not None and len(x) > 0]
@@ -649,19 +729,11 @@ def scrape_NBA_scores(proxypool,period=None,start_year=2023,sleep_seconds=0.5):
                   'VsConference': '',
                   'VsDivision': ''}
 
-        headers = {'Accept': '*/*',
-                   'Accept-Encoding': 'gzip, deflate, br',
-                   'Accept-Language': 'en-US,en;q=0.9',
-                   'Host': 'stats.nba.com',
-                   'Origin': 'https://www.nba.com',
-                   'Referer': 'https://www.nba.com/',
-                   'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
-                  }
-
-        res = requests.get('https://stats.nba.com/stats/teamgamelogs',headers=headers,params=params,proxies=proxypool.random_proxy())
+        res = proxypool.session.get('https://stats.nba.com/stats/teamgamelogs',headers=NBA_STATS_HEADERS,params=params,proxies=proxypool.random_proxy())
         time.sleep(sleep_seconds)
 
-        results_dict = res.json()
+        # Parse raw response bytes directly (a season of game logs is a large payload)
+        results_dict = orjson.loads(res.content)
 
         if len(results_dict['resultSets'][0]['rowSet']) > 0:
 
@@ -686,7 +758,7 @@ def extract_NBA_scores(results_dict):
 
     df['GAME_DATE'] = pd.to_datetime(df['GAME_DATE'])
     df = df[['GAME_ID','TEAM_ABBREVIATION','TEAM_NAME','GAME_DATE','MATCHUP','WL','PTS']].sort_values(by=['GAME_DATE','GAME_ID'])
-    df['HOME_FLAG'] = df['MATCHUP'].apply(lambda x: 'vs.' in x)
+    df['HOME_FLAG'] = df['MATCHUP'].str.contains('vs.',regex=False)
 
     home_df = df[df['HOME_FLAG']][['GAME_ID','TEAM_NAME','TEAM_ABBREVIATION','GAME_DATE','PTS']]
     home_df = home_df.rename(columns={'TEAM_NAME':'home_team','TEAM_ABBREVIATION':'home_abbr','GAME_DATE':'game_date','PTS':'home_score'})
@@ -699,13 +771,16 @@ def extract_NBA_scores(results_dict):
 
     return(gamelevel_df)
 
+# Pattern for splitting calendar event summaries of the form "🏀 Away Team @ Home Team 🏀" into team names
+NBA_SCHEDULE_SUMMARY_PATTERN = re.compile('[🏀 ]*([^@]*?)[🏀 ]*@[🏀 ]*([^@]*?)[🏀 ]*')
+
 def scrape_NBA_schedule(proxypool):
     """
     param: proxypool: pool of proxies to route requests through 
     """
     
     url = 'https://ics.ecal.com/ecal-sub/672e7abcc2eaa20008cc96e3/NBA.ics'
-    res = requests.get(url,proxies=proxypool.random_proxy())
+    res = proxypool.session.get(url,proxies=proxypool.random_proxy())
     cal = icalendar.Calendar.from_ical(res.content)
 
     game_datetime_list = []
@@ -718,18 +793,18 @@ def scrape_NBA_schedule(proxypool):
             summary = str(component.get('summary'))
             dtstart = component.get('dtstart')
 
-            game_datetime = pd.to_datetime(dtstart.dt).tz_convert('America/New_York')
+            # Skip events that aren't a matchup between two teams
+            match = NBA_SCHEDULE_SUMMARY_PATTERN.fullmatch(summary)
 
-            try:
-                away_team,home_team = summary.split('@')
-                home_team = home_team.strip('🏀 ')
-                away_team = away_team.strip('🏀 ')
+            if match is not None:
+                away_team,home_team = match.groups()
 
-                game_datetime_list.append(game_datetime)
+                game_datetime_list.append(dtstart.dt)
                 home_team_list.append(home_team)
                 away_team_list.append(away_team)
-            except:
-                pass
+
+    # Convert start times of all games to eastern time in a single call
+    game_datetime_list = pd.to_datetime(game_datetime_list,utc=True).tz_convert('America/New_York')
 
     d = {'game_datetime':game_datetime_list,
          'game_date':pd.NA,
@@ -737,7 +812,7 @@ def scrape_NBA_schedule(proxypool):
          'away_team':away_team_list}
 
     df = pd.DataFrame(data=d)
-    df['game_date'] = pd.to_datetime(df['game_datetime'].dt.date)
+    df['game_date'] = df['game_datetime'].dt.tz_localize(None).dt.normalize()
     df = df.sort_values(by='game_datetime').reset_index(drop=True)
     
     return(df)
@@ -757,76 +832,12 @@ def scrape_NCAAMB_odds_actionnetwork(proxypool,sleep_seconds=0.1,random_pause=0.
     param: failure_limit: number of times to reattempt scraping if initial request fails
     """
 
-    dist = stats.uniform(0,random_pause)
-
-    start_date = pd.Timestamp.now(tz='America/New_York')
-    end_date = start_date + pd.Timedelta(days=days_ahead)
-    query_dates = [x.strftime('%Y%m%d') for x in pd.date_range(start_date,end_date,freq='D')]
-
-    result_list = []
-
-    for query_date in query_dates:
-
-        url = f'https://api.actionnetwork.com/web/v2/scoreboard/ncaab?bookIds=15,30,2889,3120,3118,2890,2888,2887,2891,75,123&division=D1&date={query_date}&tournament=0&periods=event'
-
-        headers = {'Accept': '*/*',
-                   'Accept-Encoding': 'gzip, deflate, br',
-                   'Accept-Language': 'en-US,en;q=0.9',
-                   'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
-                  }
-
-        num_failures=0
-        success=False
-
-        while num_failures < failure_limit:
-
-            try:
-
-                res = requests.get(url,headers=headers,proxies=proxypool.random_proxy())
-                time.sleep(sleep_seconds + dist.rvs())
-
-                if res.ok:
-                    results_dict = res.json()
-                    observation_datetime = pd.Timestamp.now(tz='America/New_York')
-                    success = True
-                    break
-                else:
-                    num_failures += 1
-            except Exception as e:
-                print(e,flush=True)
-                num_failures += 1
-
-
-        if success:
-
-            if len(results_dict['games']) > 0:
-
-                current_odds_list = []
-
-                for game in results_dict['games']:
-
-                    current_odds_list.append(parse_actionnetwork(game))
+    url_template = 'https://api.actionnetwork.com/web/v2/scoreboard/ncaab?bookIds=15,30,2889,3120,3118,2890,2888,2887,2891,75,123&division=D1&date={query_date}&tournament=0&periods=event'
 
-                current_odds = pd.concat(current_odds_list)
-                current_odds.insert(0, 'observation_datetime', observation_datetime)
+    odds_df = scrape_actionnetwork(url_template,proxypool,sleep_seconds=sleep_seconds,random_pause=random_pause,days_ahead=days_ahead,failure_limit=failure_limit,drop_started_games=True)
 
-                result_list.append(current_odds)
-
-    if len(result_list) > 0:
-
-        odds_df = pd.concat(result_list)
-
-        # Drop games that have already started
-        odds_df = odds_df[odds_df['game_datetime'] > odds_df['observation_datetime']].reset_index(drop=True)
-
-        if len(odds_df) > 0:
-            return odds_df
-        else:
-            return None
+    return(odds_df)
 
-    else:
-        return None
-    
 def scrape_NCAAMB_odds_pinnacle(proxypool,sleep_seconds=0.1,random_pause=0.1,failure_limit=20):
 
     """
@@ -838,8 +849,6 @@ def scrape_NCAAMB_odds_pinnacle(proxypool,sleep_seconds=0.1,random_pause=0.1,fai
     param: failure_limit: number of times to reattempt scraping if initial request fails
     """
 
-    dist = stats.uniform(0,random_pause)
-
     matchups_url = 'https://guest.api.arcadia.pinnacle.com/0.1/leagues/493/matchups?brandId=0'
     markets_url = 'https://guest.api.arcadia.pinnacle.com/0.1/leagues/493/markets/straight'
 
@@ -856,11 +865,11 @@ def scrape_NCAAMB_odds_pinnacle(proxypool,sleep_seconds=0.1,random_pause=0.1,fai
     # Scrape matchups information
     while num_failures < failure_limit:
         try: 
-            res = requests.get(url=matchups_url,headers=headers,proxies=proxypool.random_proxy())
-            time.sleep(sleep_seconds + dist.rvs())
+            res = proxypool.session.get(url=matchups_url,headers=headers,proxies=proxypool.random_proxy())
+            time.sleep(sleep_seconds + random.uniform(0,random_pause))
 
             if res.ok:
-                matchups_results_dict = res.json()
+                matchups_results_dict = orjson.loads(res.content)
                 break
             else:
                 num_failures += 1
@@ -873,11 +882,11 @@ def scrape_NCAAMB_odds_pinnacle(proxypool,sleep_seconds=0.1,random_pause=0.1,fai
 
         try:
             headers['x-api-key'] = generate_random_string(32)
-            res = requests.get(url=markets_url,headers=headers,proxies=proxypool.random_proxy())
-            time.sleep(sleep_seconds + dist.rvs())
+            res = proxypool.session.get(url=markets_url,headers=headers,proxies=proxypool.random_proxy())
+            time.sleep(sleep_seconds + random.uniform(0,random_pause))
 
             if res.ok:
-                markets_results_dict = res.json()
+                markets_results_dict = orjson.loads(res.content)
                 break
             else:
                 num_failures += 1
@@ -899,13 +908,12 @@ def scrape_NCAAMB_odds(proxypool):
     param: proxypool: pool of proxies to route requests through
     """
     
-    odds_df_list = []
-    
-    # Scrape actionnetwork.com
-    odds_df_list.append(scrape_NCAAMB_odds_actionnetwork(proxypool))
-    
-    # Scrape pinnacle.com
-    odds_df_list.append(scrape_NCAAMB_odds_pinnacle(proxypool))
+    # Scrape actionnetwork.com and pinnacle.com at the same time, since each spends
+    # most of its time waiting on network requests
+    with cf.ThreadPoolExecutor(max_workers=2) as executor:
+        actionnetwork_future = executor.submit(scrape_NCAAMB_odds_actionnetwork,proxypool)
+        pinnacle_future = executor.submit(scrape_NCAAMB_odds_pinnacle,proxypool)
+        odds_df_list = [actionnetwork_future.result(),pinnacle_future.result()]
     
     # Concatenate results 
     odds_df_list = [x for x in odds_df_list if x is not None and len(x) > 0]
@@ -925,255 +933,234 @@ def scrape_NCAAMB_odds(proxypool):
     else:
         return None
 
-def scrape_NCAAMB_scores(proxypool,period=None,failure_limit=5,sleep_seconds=0.2):
+def fetch_NCAAMB_scoreboard(date,url,proxypool,failure_limit=5,sleep_seconds=0.2,timeout=10):
     """
+    Helper function to query data.ncaa.com scoreboard for a specific date, reattempting if request fails
+
+    param: date: date for which to retrieve scoreboard
+    param: url: scoreboard url for that date (see NCAAMB_SCOREBOARD_URL_FORMAT)
     param: proxypool: pool of proxies to route requests through
-    period: pandas.Period object corresponding to month for which to scrape scores (e.g., 2024-10)
     param: failure_limit: number of times to reattempt scraping if initial request fails
-    param: sleep_seconds: number of seconds to wait in between api queries
+    param: sleep_seconds: base number of seconds to wait before reattempting a failed api query (doubled after each failure)
+    param: timeout: number of seconds to wait for a response before counting the attempt as a failure
+    returns: results_dict: dictionary of scoreboard data (None if no response could be parsed)
     """
-    if period is None:
-        today_date = pd.Timestamp.now()
-        year = today_date.year
-        month = today_date.month
-        period = pd.Period(freq='M',year=year,month=month)
 
-    start_date = period.start_time
-    end_date = min(period.end_time,pd.Timestamp.now())
-    date_range = pd.date_range(start_date,end_date,freq='D')
+    print(date.strftime('%Y-%m-%d'),flush=True)
 
-    df_list = []
-
-    for date in date_range:
+    res = None
 
-        year = date.year
-        month = '{:02}'.format(date.month)
-        day = '{:02}'.format(date.day)
+    for attempt in range(failure_limit):
 
-        print(date.strftime('%Y-%m-%d'),flush=True)
+        # Back off exponentially between attempts, with random jitter so that
+        # concurrent requests that fail together don't all retry in lockstep
+        wait_seconds = sleep_seconds*2**attempt
+        wait_seconds += random.uniform(0,wait_seconds)
 
-        url = f'https://data.ncaa.com/casablanca/scoreboard/basketball-men/d1/{year}/{month}/{day}/scoreboard.json'
+        try:
+            res = proxypool.session.get(url,headers=NCAA_HEADERS,proxies=proxypool.random_proxy(),timeout=timeout)
 
-        headers = {'accept':'application/json, text/javascript, */*; q=0.01',
-                   'accept-encoding':'gzip, deflate, br, zstd',
-                   'accept-language':'en-US,en;q=0.9',
-                   'origin':'https://www.ncaa.com',
-                   'priority':'u=1, i',
-                   'referer':'https://www.ncaa.com/',
-                   'sec-ch-ua':'"Chromium";v="130", "Google Chrome";v="130", "Not?A_Brand";v="99"',
-                   'sec-ch-ua-mobile':'?0',
-                   'sec-ch-ua-platform':"Windows",
-                   'sec-fetch-dest':'empty',
-                   'sec-fetch-mode':'cors',
-                   'sec-fetch-site':'same-site',
-                   'user-agent':'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36'}
+            # Dates without any games return 404, which won't change on a later attempt
+            if res.ok or res.status_code == 404:
+                break
 
+            # When rate limited, wait at least as long as the server asks (up to a minute)
+            if res.status_code == 429:
+                retry_after = res.headers.get('Retry-After','')
+                if retry_after.isdigit():
+                    wait_seconds = max(wait_seconds,min(int(retry_after),60))
 
-        num_failures = 0
+        except requests.RequestException as e:
+            print(e,flush=True)
 
-        while num_failures < failure_limit:
+        # Only wait when reattempting a failed request (through a newly selected proxy)
+        if attempt < failure_limit - 1:
+            time.sleep(wait_seconds)
 
-            try:
-                res = requests.get(url,headers=headers,proxies=proxypool.random_proxy())
-                time.sleep(sleep_seconds)
+    if res is None:
+        return(None)
 
-                if res.ok:
-                    break
-                else:
-                    num_failures += 1
-            except:
-                num_failures +=1
+    # Parse last response even if unsuccessful, since dates without any games
+    # return an error message that the extract functions check for
+    # (orjson.JSONDecodeError is a subclass of ValueError)
+    try:
+        results_dict = orjson.loads(res.content)
+    except ValueError:
+        results_dict = None
 
-        try:
-            results_dict = res.json()
-            date_scores = extract_NCAAMB_scores(results_dict)
+    return(results_dict)
 
-            if date_scores is not None:
+def scrape_NCAAMB_scores(proxypool,period=None,failure_limit=5,sleep_seconds=0.2,cache_dir=None):
+    """
+    param: proxypool: pool of proxies to route requests through
+    period: pandas.Period object corresponding to month for which to scrape scores (e.g., 2024-10)
+    param: failure_limit: number of times to reattempt scraping if initial request fails
+    param: sleep_seconds: number of seconds to wait before reattempting a failed api query
+    param: cache_dir: optional directory in which to save scores by date, so that past dates are only scraped once
+    """
+    if period is None:
+        today_date = pd.Timestamp.now()
+        year = today_date.year
+        month = today_date.month
+        period = pd.Period(freq='M',year=year,month=month)
 
-                df_list.append(date_scores)
+    start_date = period.start_time
+    end_date = min(period.end_time,pd.Timestamp.now())
+    date_range = pd.date_range(start_date,end_date,freq='D')
 
-        except:
-            pass
+    score_cols = ['game_date','home_team','away_team','home_abbr','away_abbr','home_score','away_score']
 
-    if len(df_list) > 0:
+    # Scores of games played before yesterday won't change, so if a cache directory is given,
+    # reuse the records saved for those dates by previous runs instead of requesting them again
+    cache_paths = {}
+    cached_dates = set()
 
-        score_df = pd.concat(df_list).reset_index(drop=True)
+    if cache_dir is not None:
+        os.makedirs(cache_dir,exist_ok=True)
+        cache_cutoff = pd.Timestamp.now().normalize() - pd.Timedelta(days=1)
+        cache_paths = {date:os.path.join(cache_dir,f'{date.strftime("%Y-%m-%d")}_NCAAMB_scores.parquet') for date in date_range if date < cache_cutoff}
+        cached_dates = set(date for date,path in cache_paths.items() if os.path.exists(path))
 
-        if len(score_df) > 0:
-            return score_df
-        else:
-            return None
+    fetch_dates = pd.DatetimeIndex([date for date in date_range if date not in cached_dates])
+    fetch_urls = fetch_dates.strftime(NCAAMB_SCOREBOARD_URL_FORMAT)
 
-    else:
-        return None
+    fetch = lambda date,url: fetch_NCAAMB_scoreboard(date,url,proxypool,failure_limit=failure_limit,sleep_seconds=sleep_seconds)
 
-def extract_NCAAMB_scores(results_dict):
-    """
-    Helper function to process game score information scraped from data.ncaa.com
-    """
+    with cf.ThreadPoolExecutor(max_workers=16) as executor:
+        responses = dict(zip(fetch_dates,executor.map(fetch,fetch_dates,fetch_urls)))
 
-    game_date_list = []
-    home_team_list = []
-    away_team_list = []
-    home_abbr_list = []
-    away_abbr_list = []
-    home_score_list = []
-    away_score_list = []
+    # Records of games across all dates (converted to a dataframe once at the end)
+    records = []
 
-    if list(results_dict.items()) != [('Message','Object not found.')]:
+    for date in date_range:
 
-        for i in range(len(results_dict['games'])):
+        if date in cached_dates:
+            records += pd.read_parquet(cache_paths[date]).to_dict('records')
+            continue
 
-            if results_dict['games'][i]['game']['gameState'] == 'final':
+        results_dict = responses[date]
 
-                game_date_list.append(results_dict['games'][i]['game']['startDate'])
+        if results_dict is None:
+            continue
 
-                home_team_list.append(results_dict['games'][i]['game']['home']['names']['short'])
-                home_abbr_list.append(results_dict['games'][i]['game']['home']['names']['char6'])
+        try:
+            date_records = extract_NCAAMB_scores(results_dict)
+        except (KeyError,TypeError,ValueError) as e:
+            print(f'Could not parse scoreboard for {date.strftime("%Y-%m-%d")}: {e!r}',flush=True)
+            continue
+
+        records += date_records
+
+        # Cache with explicit dtypes, since scores can mix numbers with blank strings
+        # (failing to write the cache shouldn't stop the scrape)
+        if date in cache_paths:
+            date_df = pd.DataFrame(date_records,columns=score_cols).astype('string')
+            for col in ['home_score','away_score']:
+                date_df[col] = pd.to_numeric(date_df[col],errors='coerce').astype('Int64')
+            try:
+                date_df.to_parquet(cache_paths[date])
+            except (OSError,TypeError,ValueError) as e:
+                print(f'Could not cache scores for {date.strftime("%Y-%m-%d")}: {e!r}',flush=True)
 
-                try:
-                    home_score_list.append(int(results_dict['games'][i]['game']['home']['score']))
-                except:
-                    home_score_list.append(pd.NA)
+    if len(records) == 0:
+        return(None)
 
+    score_df = pd.DataFrame(records,columns=score_cols)
+    score_df['game_date'] = pd.to_datetime(score_df['game_date'])
 
-                away_team_list.append(results_dict['games'][i]['game']['away']['names']['short'])
-                away_abbr_list.append(results_dict['games'][i]['game']['away']['names']['char6'])
+    # Use nullable integers so that a game with a missing score doesn't prevent the others from being recorded
+    for col in ['home_score','away_score']:
+        score_df[col] = pd.to_numeric(score_df[col],errors='coerce').astype('Int64')
 
-                try:
-                    away_score_list.append(int(results_dict['games'][i]['game']['away']['score']))
-                except:
-                    away_score_list.append(pd.NA)
+    return(score_df)
 
+def extract_NCAAMB_scores(results_dict):
+    """
+    Helper function to process game score information scraped from data.ncaa.com
 
-        d = {'game_date':game_date_list,
-             'home_team':home_team_list,
-             'away_team':away_team_list,
-             'home_abbr':home_abbr_list,
-             'away_abbr':away_abbr_list,
-             'home_score':home_score_list,
-             'away_score':away_score_list}
+    returns: records: list of dictionaries describing the final score of each completed game
+    """
 
-        df = pd.DataFrame(data=d)
-        df[['home_score','away_score']] = df[['home_score','away_score']].astype(int)
-        df['game_date'] = pd.to_datetime(df['game_date'])
+    # Dates without any games return an error message instead of a scoreboard
+    if results_dict.get('Message') == 'Object not found.':
+        return([])
 
-        return df
+    # Unpack each completed game into a flat record (scores are left as strings here
+    # and converted to numbers for all games at once by the calling scraper)
+    games = [x['game'] for x in results_dict['games']]
 
-    else:
+    records = [{'game_date':game['startDate'],
+                'home_team':game['home']['names']['short'],
+                'away_team':game['away']['names']['short'],
+                'home_abbr':game['home']['names']['char6'],
+                'away_abbr':game['away']['names']['char6'],
+                'home_score':game['home'].get('score'),
+                'away_score':game['away'].get('score')} for game in games if game['gameState'] == 'final']
 
-        return None
+    return(records)
     
 def scrape_NCAAMB_schedule(proxypool,days_ahead=7,failure_limit=5,sleep_seconds=0.2):
     """
     param: proxypool: pool of proxies to route requests through
     period: pandas.Period object corresponding to month for which to scrape scores (e.g., 2024-10)
     param: failure_limit: number of times to reattempt scraping if initial request fails
-    param: sleep_seconds: number of seconds to wait in between api queries
+    param: sleep_seconds: number of seconds to wait before reattempting a failed api query
     """
 
     start_date = pd.Timestamp.now()
     end_date = start_date + pd.Timedelta(days=days_ahead)
     date_range = pd.date_range(start_date,end_date,freq='D')
+    urls = date_range.strftime(NCAAMB_SCOREBOARD_URL_FORMAT)
 
-    df_list = []
-
-    for date in date_range:
+    fetch = lambda date,url: fetch_NCAAMB_scoreboard(date,url,proxypool,failure_limit=failure_limit,sleep_seconds=sleep_seconds)
 
-        year = date.year
-        month = '{:02}'.format(date.month)
-        day = '{:02}'.format(date.day)
+    with cf.ThreadPoolExecutor(max_workers=16) as executor:
+        responses = list(executor.map(fetch,date_range,urls))
 
-        print(date.strftime('%Y-%m-%d'),flush=True)
+    # Records of games across all dates (converted to a dataframe once at the end)
+    records = []
 
-        url = f'https://data.ncaa.com/casablanca/scoreboard/basketball-men/d1/{year}/{month}/{day}/scoreboard.json'
+    for date,results_dict in zip(date_range,responses):
 
-        headers = {'accept':'application/json, text/javascript, */*; q=0.01',
-                   'accept-encoding':'gzip, deflate, br, zstd',
-                   'accept-language':'en-US,en;q=0.9',
-                   'origin':'https://www.ncaa.com',
-                   'priority':'u=1, i',
-                   'referer':'https://www.ncaa.com/',
-                   'sec-ch-ua':'"Chromium";v="130", "Google Chrome";v="130", "Not?A_Brand";v="99"',
-                   'sec-ch-ua-mobile':'?0',
-                   'sec-ch-ua-platform':"Windows",
-                   'sec-fetch-dest':'empty',
-                   'sec-fetch-mode':'cors',
-                   'sec-fetch-site':'same-site',
-                   'user-agent':'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36'}
-
-
-        num_failures = 0
-
-        while num_failures < failure_limit:
-
-            try:
-                res = requests.get(url,headers=headers,proxies=proxypool.random_proxy())
-                time.sleep(sleep_seconds)
-
-                if res.ok:
-                    break
-                else:
-                    num_failures += 1
-            except:
-                num_failures +=1
+        if results_dict is None:
+            continue
 
         try:
-            results_dict = res.json()
-            date_scores = extract_NCAAMB_schedule(results_dict)
-
-            if date_scores is not None:
-
-                df_list.append(date_scores)
+            records += extract_NCAAMB_schedule(results_dict)
+        except (KeyError,TypeError,ValueError) as e:
+            print(f'Could not parse scoreboard for {date.strftime("%Y-%m-%d")}: {e!r}',flush=True)
 
-        except:
-            pass
-
-    if len(df_list) > 0:
+    if len(records) == 0:
+        return(None)
 
-        score_df = pd.concat(df_list).reset_index(drop=True)
+    # Put games in order of start time by sorting the integer epoch times before building the dataframe
+    order = np.argsort([record['game_datetime'] for record in records],kind='stable')
+    records = [records[i] for i in order]
 
-        if len(score_df) > 0:
-            return score_df
-        else:
-            return None
+    schedule_df = pd.DataFrame(records,columns=['game_datetime','game_date','home_team','away_team'])
+    schedule_df['game_datetime'] = pd.to_datetime(schedule_df['game_datetime'],unit='s',utc=True).dt.tz_convert('America/New_York')
+    schedule_df['game_date'] = schedule_df['game_datetime'].dt.tz_localize(None).dt.normalize()
 
-    else:
-        return None
+    return(schedule_df)
     
 def extract_NCAAMB_schedule(results_dict):
     """
-    Helper function to process game score information scraped from data.ncaa.com
-    """
-
-    game_datetime_list = []
-    home_team_list = []
-    away_team_list = []
-    
-    if list(results_dict.items()) != [('Message','Object not found.')]:
-
-        for i in range(len(results_dict['games'])):
-            
-            epoch_time = int(results_dict['games'][i]['game']['startTimeEpoch'])
-            game_datetime = pd.to_datetime(dt.datetime.fromtimestamp(epoch_time)).tz_localize('America/New_York')
-
-            game_datetime_list.append(game_datetime)
-            home_team_list.append(results_dict['games'][i]['game']['home']['names']['short'])
-            away_team_list.append(results_dict['games'][i]['game']['away']['names']['short'])
-
-        d = {'game_datetime':game_datetime_list,
-             'game_date':pd.NA,
-             'home_team':home_team_list,
-             'away_team':away_team_list}
+    Helper function to process game schedule information scraped from data.ncaa.com
 
-        df = pd.DataFrame(data=d)
-        df['game_date'] = pd.to_datetime(df['game_datetime'].dt.date)
-        df = df.sort_values(by='game_datetime').reset_index(drop=True)
+    returns: records: list of dictionaries describing the start time and teams of each game
+    """
 
-        return df
+    # Dates without any games return an error message instead of a scoreboard
+    if results_dict.get('Message') == 'Object not found.':
+        return([])
 
-    else:
+    # Start times are kept as seconds since epoch here and converted to timestamps
+    # for all games at once by the calling scraper
+    games = [x['game'] for x in results_dict['games']]
 
-        return None
-    
+    records = [{'game_datetime':int(game['startTimeEpoch']),
+                'game_date':pd.NA,
+                'home_team':game['home']['names']['short'],
+                'away_team':game['away']['names']['short']} for game in games]
 
+    return(records)